@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from pymongo import UpdateOne
+
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+STEPS = {MINUTE: timedelta(minutes=1), HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+# How long buckets of each resolution are kept before Mongo expires them
+DEFAULT_RETENTION = {MINUTE: timedelta(days=2), HOUR: timedelta(days=90), DAY: timedelta(days=730)}
+
+COUNTERS = ("products_analyzed", "reviews_processed", "scores_updated", "score_sum", "score_count")
+
+
+def as_utc(moment: datetime) -> datetime:
+    # Naive datetimes are taken as UTC, which is what the driver returns
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def bucket_start(moment: datetime, step: str) -> datetime:
+    moment = as_utc(moment)
+    if step == MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    if step == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_id(step: str, start: datetime) -> str:
+    """Bucket key; ids of one resolution sort in time order, so ranges are _id index scans"""
+
+    return f"{step}:{start:%Y-%m-%dT%H:%M}"
+
+
+class ActivityRollups:
+    """Pre-aggregated activity counters in per-minute, per-hour and per-day buckets
+
+    Every write increments the bucket it falls in at all three
+    resolutions in one unordered bulk write, so the coarser buckets are
+    rolled up as the data arrives and no compaction job has to run. Each
+    bucket carries an expires_at date and a TTL index drops it once the
+    retention of its resolution has passed. Averages are kept as a sum
+    and count, like the dashboard stats.
+    """
+
+    def __init__(self, db, retention: Optional[Dict[str, timedelta]] = None):
+        self.collection = db["activity_buckets"]
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+
+    def updates(self, inc: Dict[str, float], moment: Optional[datetime] = None) -> List[UpdateOne]:
+        moment = moment or datetime.now(timezone.utc)
+        updates = []
+        for step in STEPS:
+            start = bucket_start(moment, step)
+            updates.append(UpdateOne(
+                {"_id": bucket_id(step, start)},
+                {
+                    "$inc": inc,
+                    "$setOnInsert": {"step": step, "start": start, "expires_at": start + self.retention[step]},
+                },
+                upsert=True,
+            ))
+        return updates
+
+    async def record(
+        self,
+        products_analyzed: int = 0,
+        reviews_processed: int = 0,
+        scores: Sequence[float] = (),
+        session=None,
+    ) -> None:
+        inc = {
+            "products_analyzed": products_analyzed,
+            "reviews_processed": reviews_processed,
+            "scores_updated": len(scores),
+            "score_sum": sum(scores),
+            "score_count": len(scores),
+        }
+        if not any(inc.values()):
+            return
+        await self.collection.bulk_write(self.updates(inc), ordered=False, session=session)
+
+    @staticmethod
+    def _point(start: datetime, bucket: Dict[str, Any]) -> Dict[str, Any]:
+        score_count = bucket.get("score_count", 0)
+        return {
+            "start": start.isoformat(),
+            "products_analyzed": bucket.get("products_analyzed", 0),
+            "reviews_processed": bucket.get("reviews_processed", 0),
+            "scores_updated": bucket.get("scores_updated", 0),
+            "average_score": round(bucket.get("score_sum", 0) / score_count, 2) if score_count else None,
+        }
+
+    async def series(self, start: datetime, end: datetime, step: str) -> List[Dict[str, Any]]:
+        """One point per step from the bucket holding start up to end, empty buckets included"""
+
+        end = as_utc(end)
+        starts = []
+        moment = bucket_start(start, step)
+        while moment < end:
+            starts.append(moment)
+            moment += STEPS[step]
+        if not starts:
+            return []
+
+        cursor = self.collection.find(
+            {"_id": {"$gte": bucket_id(step, starts[0]), "$lte": bucket_id(step, starts[-1])}},
+            {"_id": 1, **{counter: 1 for counter in COUNTERS}},
+        )
+        buckets = {bucket["_id"]: bucket async for bucket in cursor}
+        return [self._point(moment, buckets.get(bucket_id(step, moment), {})) for moment in starts]
+
+    async def day(self, moment: Optional[datetime] = None) -> Dict[str, Any]:
+        """Totals of the (UTC) day holding moment, today by default"""
+
+        start = bucket_start(moment or datetime.now(timezone.utc), DAY)
+        bucket = await self.collection.find_one({"_id": bucket_id(DAY, start)}) or {}
+        return self._point(start, bucket)
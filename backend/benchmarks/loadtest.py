@@ -0,0 +1,426 @@
+"""Offline load test for the Trust Lens API
+
+Runs the FastAPI app in process with a fake LLM backend and either a
+local mongod (--mongo mongodb://...) or an in-memory stand-in (--mongo
+memory, needs mongomock-motor). Each scenario drives one endpoint at a
+fixed concurrency and reports latency percentiles, requests per second,
+Mongo operations and LLM calls per request.
+
+The in-memory stand-in scans collections for every query and slows down
+as they grow, so only compare its numbers with baselines recorded the
+same way; use mongod for absolute numbers.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python benchmarks/loadtest.py --mongo memory --save-baseline memory
+    python benchmarks/loadtest.py --mongo memory --baseline memory
+
+With --baseline, the run uses the settings the baseline was recorded
+with and refuses options that contradict them. Scenarios whose p95
+latency or throughput regressed by more than --tolerance are reported
+and the exit status is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+
+class FakeLlmBackend:
+    """Stands in for the provider: sampled latency, injected failures, well-formed analyses"""
+
+    def __init__(
+        self,
+        latency: str = "lognormal",
+        median_ms: float = 800,
+        sigma: float = 0.5,
+        failure_rate: float = 0.0,
+        invalid_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def delay(self) -> float:
+        if self.latency == "fixed":
+            milliseconds = self.median_ms
+        elif self.latency == "uniform":
+            # Uniform around the median, sigma as the relative half-width
+            milliseconds = self.median_ms * self.random.uniform(1 - self.sigma, 1 + self.sigma)
+        else:
+            milliseconds = self.random.lognormvariate(0, self.sigma) * self.median_ms
+        return max(0.0, milliseconds) / 1000
+
+    @staticmethod
+    def analysis(review_text: str) -> Dict[str, Any]:
+        ratings = [int(rating) for rating in re.findall(r"Rating: (\d)/5", review_text)] or [3]
+        score = round(sum(ratings) / len(ratings) * 20, 1)
+        sentiment = "positive" if score >= 60 else "negative" if score < 40 else "neutral"
+        return {
+            "overall_score": score,
+            "total_reviews": len(ratings),
+            "aspect_analysis": [
+                {"aspect": aspect, "score": score, "sentiment": sentiment, "key_points": [f"{aspect} reviewed"]}
+                for aspect in ("Quality", "Delivery", "Customer Service")
+            ],
+            "summary": f"Average rating {sum(ratings) / len(ratings):.1f}/5",
+            "recommendation": "buy - fake analysis" if score >= 70 else "consider - fake analysis",
+        }
+
+    async def reply(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay())
+        roll = self.random.random()
+        if roll < self.failure_rate:
+            raise RuntimeError("Fake LLM failure")
+        if roll < self.failure_rate + self.invalid_rate:
+            return "Sorry, I cannot produce JSON right now."
+
+        sections = re.split(r"=== Review set (\S+) ===", prompt)
+        if len(sections) > 1:
+            results = [
+                dict(self.analysis(text), review_set=reference)
+                for reference, text in zip(sections[1::2], sections[2::2])
+            ]
+            return "```json\n" + json.dumps({"results": results}) + "\n```"
+        return json.dumps(self.analysis(prompt))
+
+
+class FakeChat:
+    def __init__(self, backend: FakeLlmBackend):
+        self.backend = backend
+
+    async def send_message(self, prompt: str) -> str:
+        return await self.backend.reply(prompt)
+
+
+def count_mongo_ops() -> float:
+    from metrics import MONGO_LATENCY
+
+    return sum(
+        sample.value
+        for metric in MONGO_LATENCY.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_count")
+    )
+
+
+def use_in_memory_mongo() -> None:
+    """Swap the Motor client for mongomock-motor, recording its operations like the command listener does"""
+
+    try:
+        import mongomock.collection
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--mongo memory needs mongomock-motor (pip install -r requirements-dev.txt)")
+
+    from metrics import MONGO_LATENCY
+
+    def instrument(name: str):
+        method = getattr(mongomock.collection.Collection, name)
+
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                MONGO_LATENCY.labels(self.name, name, "success").observe(time.perf_counter() - start)
+
+        setattr(mongomock.collection.Collection, name, wrapper)
+
+    for name in (
+        "find", "find_one", "find_one_and_update", "insert_one", "insert_many", "update_one",
+        "update_many", "replace_one", "bulk_write", "count_documents", "estimated_document_count",
+        "aggregate", "create_index", "delete_many",
+    ):
+        instrument(name)
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def review_row(product_id: str) -> Dict[str, Any]:
+    token = uuid.uuid4().hex[:8]
+    return {
+        "product_id": product_id,
+        "author": f"Load Tester {token}",
+        "rating": random.randint(1, 5),
+        "title": f"Review {token}",
+        "content": f"Generated review {token}. Good quality, delivery was on time.",
+        "date": "2024-01-01",
+        "verified": True,
+        "platform": "Amazon",
+    }
+
+
+def build_scenarios(product_ids: List[str], bulk_rows: int) -> Dict[str, Callable[[Any, int], Any]]:
+    """Scenario name -> coroutine function issuing one request"""
+
+    def pick() -> str:
+        return random.choice(product_ids)
+
+    def bulk_body() -> bytes:
+        rows = (json.dumps(review_row(pick())) for _ in range(bulk_rows))
+        return ("\n".join(rows) + "\n").encode("utf-8")
+
+    return {
+        "analyze_llm": lambda http, i: http.post("/api/analyze-product", json={"product_name": f"LLM {i}"}),
+        "analyze_fast": lambda http, i: http.post("/api/analyze-product?mode=fast", json={"product_name": f"Fast {i}"}),
+        "analyze_hybrid": lambda http, i: http.post("/api/analyze-product?mode=hybrid", json={"product_name": f"Hybrid {i}"}),
+        "analyze_batch_10": lambda http, i: http.post(
+            "/api/analyze-products", json=[{"product_name": f"Batch {i}-{n}"} for n in range(10)]
+        ),
+        "get_product": lambda http, i: http.get(f"/api/product/{pick()}"),
+        "get_reviews": lambda http, i: http.get(f"/api/reviews/{pick()}"),
+        "list_products": lambda http, i: http.get("/api/products?limit=20"),
+        "append_review_fast": lambda http, i: http.post(
+            f"/api/product/{pick()}/reviews?mode=fast", json=[review_row(pick())]
+        ),
+        "bulk_reviews": lambda http, i: http.post(
+            "/api/reviews/bulk", content=bulk_body(), headers={"Content-Type": "application/x-ndjson"}
+        ),
+        "dashboard": lambda http, i: http.get("/api/dashboard/analytics"),
+    }
+
+
+async def run_scenario(http, name: str, request, count: int, concurrency: int, backend: FakeLlmBackend) -> Dict[str, Any]:
+    for warmup in range(min(concurrency, 5)):
+        await request(http, f"warmup-{warmup}")
+
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+    mongo_before = count_mongo_ops()
+    llm_before = backend.calls
+
+    async def worker() -> None:
+        nonlocal issued, errors
+        while issued < count:
+            issued += 1
+            index = issued
+            start = time.perf_counter()
+            try:
+                response = await request(http, f"{name}-{index}")
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mongo_ops_per_request": round((count_mongo_ops() - mongo_before) / len(latencies), 2),
+        "llm_calls_per_request": round((backend.calls - llm_before) / len(latencies), 2),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        p95_change = result["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rps_change = result["rps"] / previous["rps"] - 1 if previous["rps"] else 0.0
+        flagged = p95_change > tolerance or rps_change < -tolerance
+        print(f"  {name:<20} p95 {p95_change:+7.1%}  rps {rps_change:+7.1%}{'  REGRESSION' if flagged else ''}")
+        if flagged:
+            regressions.append(name)
+    return regressions
+
+
+async def main(args) -> int:
+    # Configuration is read when the server module is imported
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["DB_NAME"] = f"trustlens_bench_{os.getpid()}"
+    if args.mongo == "memory":
+        use_in_memory_mongo()
+    else:
+        os.environ["MONGO_URL"] = args.mongo
+    if not args.analysis_cache:
+        # Expire analyses immediately so every LLM scenario request reaches the LLM
+        os.environ["ANALYSIS_CACHE_TTL_SECONDS"] = "0"
+    logging.getLogger("trustlens").setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    import httpx
+    import server
+    from llm import LlmClient
+
+    backend = FakeLlmBackend(
+        latency=args.llm_latency,
+        median_ms=args.llm_median_ms,
+        sigma=args.llm_sigma,
+        failure_rate=args.llm_failure_rate,
+        invalid_rate=args.llm_invalid_rate,
+        seed=args.seed,
+    )
+
+    class FakeLlmClient(LlmClient):
+        def _chat(self):
+            return FakeChat(backend)
+
+        def _message(self, prompt: str) -> str:
+            # Plain prompts keep the provider SDKs out of the benchmark
+            return prompt
+
+    server.llm_client = FakeLlmClient(
+        api_key="fake-key",
+        provider=server.LLM_PROVIDER,
+        model=server.LLM_MODEL,
+        system_message=server.ANALYSIS_SYSTEM_MESSAGE,
+        requests_per_minute=args.llm_rpm,
+        tokens_per_minute=args.llm_tpm,
+        max_concurrency=args.llm_concurrency,
+    )
+    random.seed(args.seed)
+
+    selected = args.scenarios.split(",") if args.scenarios else None
+    results: Dict[str, Dict[str, Any]] = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=300) as http:
+            product_ids = []
+            for index in range(args.seed_products):
+                response = await http.post("/api/analyze-product?mode=fast", json={"product_name": f"Seed {index}"})
+                product_ids.append(response.json()["id"])
+
+            scenarios = build_scenarios(product_ids, args.bulk_rows)
+            unknown = set(selected or ()) - set(scenarios)
+            if unknown:
+                sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+            print(f"{'scenario':<20} {'reqs':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8} {'mongo/req':>9} {'llm/req':>7}")
+            for name, request in scenarios.items():
+                if selected and name not in selected:
+                    continue
+                result = await run_scenario(http, name, request, args.requests, args.concurrency, backend)
+                results[name] = result
+                print(
+                    f"{name:<20} {result['requests']:>6} {result['errors']:>4} {result['p50_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>8.1f} "
+                    f"{result['mongo_ops_per_request']:>9.2f} {result['llm_calls_per_request']:>7.2f}"
+                )
+
+        if args.mongo != "memory":
+            await server.client.drop_database(os.environ["DB_NAME"])
+
+    status = 0
+    if args.baseline:
+        print(f"Compared with baseline {args.baseline}:")
+        regressions = compare(results, args.baseline_results, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            status = 1
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as baseline_file:
+            json.dump({"config": run_settings(args), "results": results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"Saved baseline to {path}")
+    return status
+
+
+# Options that do not change what a run measures; everything else has to
+# match a baseline for the comparison to mean anything
+REPORTING_OPTIONS = ("save_baseline", "baseline", "tolerance", "verbose", "scenarios")
+
+
+def run_settings(args) -> Dict[str, Any]:
+    return {key: value for key, value in vars(args).items() if key not in REPORTING_OPTIONS}
+
+
+def apply_baseline_settings(parser: argparse.ArgumentParser, args) -> None:
+    """Run with the settings the baseline was recorded with
+
+    Options left at their defaults take the baseline's value; options set
+    to something else than the baseline used are refused.
+    """
+
+    with open(os.path.join(BASELINES_DIR, f"{args.baseline}.json"), encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    adopted = []
+    conflicts = []
+    for key, recorded in baseline["config"].items():
+        if key in REPORTING_OPTIONS or not hasattr(args, key):
+            continue
+        current = getattr(args, key)
+        option = f"--{key.replace('_', '-')}"
+        if current == recorded:
+            continue
+        if current == parser.get_default(key):
+            setattr(args, key, recorded)
+            adopted.append(f"{option}={recorded}")
+        else:
+            conflicts.append(f"{option}={current} (baseline: {recorded})")
+    if conflicts:
+        parser.error(f"baseline {args.baseline} was recorded with other settings: {', '.join(conflicts)}")
+    if adopted:
+        print(f"Using the settings of baseline {args.baseline}: {' '.join(adopted)}")
+    args.baseline_results = baseline["results"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", default="memory", help='"memory" or a MongoDB URL such as mongodb://localhost:27017')
+    parser.add_argument("--scenarios", help="Comma-separated scenarios to run (default: all)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed-products", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--bulk-rows", type=int, default=1000, help="NDJSON rows per bulk_reviews request")
+    parser.add_argument("--analysis-cache", action="store_true", help="Keep the analysis cache enabled")
+    parser.add_argument("--llm-latency", choices=("lognormal", "uniform", "fixed"), default="lognormal")
+    parser.add_argument("--llm-median-ms", type=float, default=800)
+    parser.add_argument("--llm-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-invalid-rate", type=float, default=0.0, help="Share of replies that are not JSON")
+    parser.add_argument("--llm-rpm", type=float, default=1_000_000)
+    parser.add_argument("--llm-tpm", type=float, default=1_000_000_000)
+    parser.add_argument("--llm-concurrency", type=int, default=64)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--baseline", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if args.baseline:
+        apply_baseline_settings(parser, args)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
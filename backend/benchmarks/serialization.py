@@ -0,0 +1,84 @@
+"""Serialization and compression benchmark for typical API payloads
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with
+FastJSONResponse (orjson, pydantic-core for models), and the bytes on the
+wire for identity, gzip and brotli encodings.
+
+    cd backend && python benchmarks/serialization.py [--reviews 100]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime
+
+import brotli
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from responses import FastJSONResponse  # noqa: E402
+from server import MOCK_REVIEWS, Product, Review, fallback_trust_score  # noqa: E402
+
+
+def build_payloads(review_count: int):
+    reviews = []
+    for index in range(review_count):
+        review = dict(MOCK_REVIEWS[index % len(MOCK_REVIEWS)])
+        review.update(id=f"review-{index}", product_id="benchmark", author=f"{review['author']} {index}")
+        reviews.append(Review(**review).model_dump())
+
+    product = Product(
+        id="benchmark",
+        name="Benchmark Product",
+        url="https://example.com/product/benchmark",
+        description="Payload used to benchmark response serialization",
+        trust_score=fallback_trust_score("benchmark", reviews),
+        created_at=datetime.now().isoformat(),
+    )
+    return {
+        "reviews": {"product_id": "benchmark", "reviews": reviews, "total": len(reviews)},
+        "product": product,
+    }
+
+
+def per_call_ms(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'payload':<10} {'encoder':<18} {'ms/resp':>8} {'identity':>9} {'gzip-6':>8} {'gzip-9':>8} {'br-4':>8}")
+    for name, content in build_payloads(args.reviews).items():
+        encoders = {
+            "fastapi default": lambda: JSONResponse(jsonable_encoder(content)).body,
+            "FastJSONResponse": lambda: FastJSONResponse(content).body,
+        }
+        for label, encode in encoders.items():
+            body = encode()
+            print(
+                f"{name:<10} {label:<18} {per_call_ms(encode, args.repeat):>8.3f} {len(body):>9} "
+                f"{len(gzip.compress(body, 6)):>8} {len(gzip.compress(body, 9)):>8} "
+                f"{len(brotli.compress(body, quality=4)):>8}"
+            )
+
+        body = FastJSONResponse(content).body
+        print(
+            f"{name:<10} {'compress only':<18} gzip-9 {per_call_ms(lambda: gzip.compress(body, 9), args.repeat):.3f} ms, "
+            f"br-4 {per_call_ms(lambda: brotli.compress(body, quality=4), args.repeat):.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
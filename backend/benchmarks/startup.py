@@ -0,0 +1,95 @@
+"""Cold start benchmark: how long importing the API takes, and what it imports
+
+Imports the server module in fresh interpreters under -X importtime and
+reports the median import time, the slowest top-level imports and any
+module that should only be loaded on first use but was imported eagerly.
+Importing the server opens no connections, so no Mongo is needed.
+
+    cd backend
+    python benchmarks/startup.py [--runs 5] [--top 15]
+
+The exit status is 1 when one of the --lazy modules was imported.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use by the server; importing them at startup is a regression
+LAZY_MODULES = ["emergentintegrations", "numpy", "pyinstrument"]
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module: str) -> List[Tuple[int, str, int, int]]:
+    """(depth, module, self us, cumulative us) of every import, in completion order"""
+
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "startup-benchmark")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((len(indent) // 2, name, int(own), int(cumulative)))
+    return imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="server", help="module to import (default: server)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument(
+        "--lazy",
+        default=",".join(LAZY_MODULES),
+        help="comma-separated modules that must not be imported at startup",
+    )
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    cumulative: Dict[str, List[int]] = {}
+    imported = set()
+    for _ in range(args.runs):
+        imports = import_times(args.module)
+        # Top-level imports (site, the module itself) add up to the whole
+        totals.append(sum(total for depth, _, _, total in imports if depth == 0) / 1000)
+        for depth, name, _, total in imports:
+            imported.add(name)
+            if depth <= 1:
+                cumulative.setdefault(name, []).append(total)
+
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms, "
+          f"min {min(totals):.1f} ms over {args.runs} runs, {len(imported)} modules")
+    print()
+    print(f"{'module':<40} {'cumulative ms':>14}")
+    slowest = sorted(cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in slowest[:args.top]:
+        print(f"{name:<40} {statistics.median(samples) / 1000:>14.1f}")
+
+    lazy = {name for name in args.lazy.split(",") if name}
+    eager = sorted({name.split(".")[0] for name in imported} & lazy)
+    if eager:
+        print()
+        print(f"Imported at startup but meant to load on first use: {', '.join(eager)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from pymongo import ReturnDocument
+
+
+class TTLCache:
+    """In-process LRU cache with a per-entry time to live
+
+    With max_bytes and sizeof set, the cache is also bounded by the total
+    size of its values as measured by sizeof.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would evict everything else and still not fit
+            self._remove(key)
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def invalidate(self, key: str) -> None:
+        self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.sizeof is not None:
+            stats["bytes"] = self.bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+# Review fields that end up in the analysis prompt; anything else (ids,
+# authors, dates) does not change the LLM output and is left out of the key.
+REVIEW_KEY_FIELDS = ("rating", "title", "content", "platform", "verified")
+
+
+def analysis_cache_key(reviews: Iterable[Dict], model: str, prompt_version: str) -> str:
+    """Stable content hash of a review set for a given model and prompt version"""
+
+    normalized = sorted(
+        json.dumps(
+            {field: review.get(field) for field in REVIEW_KEY_FIELDS},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        for review in reviews
+    )
+    payload = json.dumps(
+        {"model": model, "prompt_version": prompt_version, "reviews": normalized},
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier cache for trust analyses: in-process LRU in front of a Mongo collection"""
+
+    def __init__(self, collection, max_entries: int = 1024, ttl_seconds: float = 86400):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.local = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.store_hits = 0
+        self.store_misses = 0
+        self.store_errors = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            document = await self.collection.find_one(
+                {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"_id": 0, "value": 1},
+            )
+        except Exception:
+            # The shared tier is best effort; a Mongo hiccup must not fail the analysis
+            self.store_errors += 1
+            return None
+
+        if not document:
+            self.store_misses += 1
+            return None
+
+        self.store_hits += 1
+        self.local.set(key, document["value"])
+        return document["value"]
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.local.set(key, value)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {"key": key, "value": value, "expires_at": expires_at}},
+                upsert=True,
+            )
+        except Exception:
+            self.store_errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.local.stats(),
+            "mongo": {
+                "hits": self.store_hits,
+                "misses": self.store_misses,
+                "errors": self.store_errors,
+            },
+        }
+
+
+def json_size(value: Any) -> int:
+    """Size of a document as compact JSON, a proxy for the memory it holds"""
+
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class CacheInvalidator:
+    """Invalidation hook shared by the processes that cache the same documents
+
+    The default does nothing, which is right for a single process: local
+    invalidation already covers every write.
+    """
+
+    async def publish(self, keys: Iterable[str]) -> None:
+        """Announce that keys changed"""
+
+    async def changed(self) -> bool:
+        """Whether another process changed documents since the last call"""
+
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"type": "local"}
+
+
+class VersionCounterInvalidator(CacheInvalidator):
+    """Shares invalidations through a version counter document in Mongo
+
+    Every write bumps the counter. Readers poll it at most once per
+    poll_interval and drop their whole cache when it moved, so other
+    processes serve stale documents for at most poll_interval seconds.
+    """
+
+    def __init__(self, collection, name: str, poll_interval: float = 1.0):
+        self.collection = collection
+        self.name = name
+        self.poll_interval = poll_interval
+        self.version: Optional[int] = None
+        self._next_poll = 0.0
+        self.polls = 0
+        self.resets = 0
+        self.errors = 0
+
+    async def publish(self, keys: Iterable[str]) -> None:
+        try:
+            result = await self.collection.find_one_and_update(
+                {"_id": self.name},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception:
+            self.errors += 1
+            return
+        # This process already invalidated locally; only later bumps are news
+        if self.version is not None and result and result["version"] == self.version + 1:
+            self.version = result["version"]
+
+    async def changed(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_poll:
+            return False
+        self._next_poll = now + self.poll_interval
+        self.polls += 1
+        try:
+            document = await self.collection.find_one({"_id": self.name}, {"version": 1})
+        except Exception:
+            self.errors += 1
+            return False
+
+        version = document["version"] if document else 0
+        previous, self.version = self.version, version
+        if previous is not None and version != previous:
+            self.resets += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "type": "version_counter",
+            "version": self.version,
+            "poll_interval": self.poll_interval,
+            "polls": self.polls,
+            "resets": self.resets,
+            "errors": self.errors,
+        }
+
+
+class ProductCache:
+    """Read-through cache for product documents in front of the products collection
+
+    Returned documents are shared between requests and must not be modified.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 60,
+        invalidator: Optional[CacheInvalidator] = None,
+    ):
+        self.collection = collection
+        self.local = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes, sizeof=json_size)
+        self.invalidator = invalidator or CacheInvalidator()
+        # Bumped by every invalidation, so a read that raced a write does not
+        # put the document it read before the write back into the cache
+        self._generation = 0
+
+    async def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        product = await self.cached(product_id)
+        if product is not None:
+            return product
+        return await self.load(product_id)
+
+    async def cached(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """The cached document, without reading Mongo on a miss"""
+
+        if await self.invalidator.changed():
+            self._reset()
+        return self.local.get(product_id)
+
+    async def load(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Read a product from Mongo and cache it"""
+
+        generation = self._generation
+        product = await self.collection.find_one({"id": product_id}, {"_id": 0})
+        if product is not None and generation == self._generation:
+            self.local.set(product_id, product)
+        return product
+
+    async def invalidate(self, product_ids: Iterable[str]) -> None:
+        product_ids = list(product_ids)
+        self._generation += 1
+        for product_id in product_ids:
+            self.local.invalidate(product_id)
+        await self.invalidator.publish(product_ids)
+
+    def _reset(self) -> None:
+        self._generation += 1
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"memory": self.local.stats(), "invalidation": self.invalidator.stats()}
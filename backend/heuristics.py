@@ -0,0 +1,192 @@
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Substrings are matched against normalized text padded with spaces, so a
+# leading space anchors a keyword to the start of a word ("deliver" also
+# matches "delivery", " helpful" does not match "unhelpful").
+ASPECT_KEYWORDS = {
+    "Quality": [
+        " quality", " material", " build", " durab", " sturdy", " broke", " defect",
+        " flims", " cheap", " well made", " craftsmanship", " description", " described",
+    ],
+    "Delivery": [
+        " deliver", " shipping", " shipped", " arriv", " packag", " on time", " late ",
+        " delay", " courier",
+    ],
+    "Customer Service": [
+        " customer service", " support", " service", " respon", " seller", " refund",
+        " return", " helpful", " unhelpful",
+    ],
+}
+
+POSITIVE_WORDS = [
+    " excellent", " outstanding", " great", " good", " amazing", " love", " perfect",
+    " fast", " quick", " helpful", " happy", " recommend", " exceeded", " safely",
+    " decent", " sturdy", " durable", " well made", " on time", " best", " satisf",
+]
+
+NEGATIVE_WORDS = [
+    " poor", " bad ", " broke", " terrible", " awful", " slow", " late ", " unhelpful",
+    " disappoint", " worst", " defect", " damaged", " never arrived", " waste",
+    " didn t match", " not as described", " longer than expected",
+]
+
+NEGATIONS = [" not", " never", " no", " didn t", " isn t", " wasn t"]
+
+# Unverified reviews count half as much as verified purchases
+UNVERIFIED_WEIGHT = 0.5
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_NON_LETTERS = re.compile(r"[^a-z]+")
+
+
+def _normalize(text: str) -> str:
+    return " " + _NON_LETTERS.sub(" ", text.lower()).strip() + " "
+
+
+def _count(texts: np.ndarray, words: List[str]) -> np.ndarray:
+    """Total occurrences of any of words in each text"""
+
+    counts = np.zeros(len(texts), dtype=np.int32)
+    for word in words:
+        counts += np.char.count(texts, word)
+    return counts
+
+
+def _polarity(texts: np.ndarray) -> np.ndarray:
+    """Lexicon polarity in [-1, 1] for each text, with simple negation handling"""
+
+    positive = _count(texts, POSITIVE_WORDS)
+    negative = _count(texts, NEGATIVE_WORDS)
+    negated = _count(texts, [negation + word for negation in NEGATIONS for word in POSITIVE_WORDS])
+    positive = positive - negated
+    negative = negative + negated
+    total = positive + negative
+    return np.where(total > 0, (positive - negative) / np.maximum(total, 1), 0.0)
+
+
+def _sentiment(score: float) -> str:
+    if score >= 60:
+        return "positive"
+    if score < 40:
+        return "negative"
+    return "neutral"
+
+
+def _snippet(sentence: str, limit: int = 90) -> str:
+    sentence = sentence.strip()
+    return sentence if len(sentence) <= limit else sentence[: limit - 3].rstrip() + "..."
+
+
+def score_reviews(reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Score a batch of reviews locally, without calling an LLM
+
+    Returns analysis data in the same shape the LLM is asked to produce.
+    Review sentences are flattened into one array so keyword matching runs
+    once per lexicon entry over the whole batch rather than per review.
+    """
+
+    review_count = len(reviews)
+    if review_count == 0:
+        return {
+            "overall_score": 50.0,
+            "total_reviews": 0,
+            "aspect_analysis": [
+                {"aspect": aspect, "score": 50.0, "sentiment": "neutral", "key_points": ["No reviews to analyze"]}
+                for aspect in ASPECT_KEYWORDS
+            ],
+            "summary": "No reviews available for analysis",
+            "recommendation": "consider - Not enough reviews to judge this product",
+        }
+
+    ratings = np.array([review.get("rating", 3) for review in reviews], dtype=np.float64)
+    weights = np.where([bool(review.get("verified")) for review in reviews], 1.0, UNVERIFIED_WEIGHT)
+    # Star ratings mapped onto [-1, 1]
+    rating_sentiment = np.clip((ratings - 3) / 2, -1, 1)
+
+    sentences = []
+    owners = []
+    for index, review in enumerate(reviews):
+        text = f"{review.get('title', '')}. {review.get('content', '')}"
+        for sentence in _SENTENCE_SPLIT.split(text):
+            if sentence.strip(" ."):
+                sentences.append(sentence)
+                owners.append(index)
+    owners = np.array(owners, dtype=np.int64)
+    # dtype=str keeps the array a string array when no review has any text
+    normalized = np.array([_normalize(sentence) for sentence in sentences], dtype=str)
+    sentence_polarity = _polarity(normalized)
+
+    aspects = list(ASPECT_KEYWORDS)
+    aspect_scores = np.zeros(len(aspects))
+    aspect_mentions = np.zeros(len(aspects))
+    aspect_analysis = []
+    for column, aspect in enumerate(aspects):
+        mentioned = _count(normalized, ASPECT_KEYWORDS[aspect]) > 0
+
+        # Per review: does it mention the aspect, and how positively
+        review_mentions = np.zeros(review_count)
+        review_polarity = np.zeros(review_count)
+        np.add.at(review_mentions, owners[mentioned], 1)
+        np.add.at(review_polarity, owners[mentioned], sentence_polarity[mentioned])
+        mentions = review_mentions > 0
+        review_polarity = np.divide(review_polarity, review_mentions, out=np.zeros(review_count), where=mentions)
+
+        # Blend what was said about the aspect with the star rating
+        blended = 0.6 * review_polarity + 0.4 * rating_sentiment
+        aspect_weights = weights * mentions
+        if aspect_weights.sum() > 0:
+            score = 50 + 50 * float(np.average(blended, weights=aspect_weights))
+        else:
+            score = 50 + 50 * float(np.average(rating_sentiment, weights=weights))
+        score = round(float(np.clip(score, 0, 100)), 1)
+        aspect_scores[column] = score
+        aspect_mentions[column] = mentions.sum()
+
+        key_points = [f"Mentioned in {int(mentions.sum())} of {review_count} reviews"]
+        if mentioned.any():
+            candidates = np.flatnonzero(mentioned)
+            # Quote the sentence that best explains the direction of the score
+            pick = candidates[np.argmax(sentence_polarity[candidates])] if score >= 50 \
+                else candidates[np.argmin(sentence_polarity[candidates])]
+            key_points.append(f'"{_snippet(sentences[pick])}"')
+        else:
+            key_points.append("Not discussed in reviews; score based on ratings")
+
+        aspect_analysis.append({
+            "aspect": aspect,
+            "score": score,
+            "sentiment": _sentiment(score),
+            "key_points": key_points,
+        })
+
+    rating_score = 50 + 50 * float(np.average(rating_sentiment, weights=weights))
+    if aspect_mentions.sum() > 0:
+        overall = 0.5 * rating_score + 0.5 * float(np.average(aspect_scores, weights=aspect_mentions))
+    else:
+        overall = rating_score
+    overall = round(float(np.clip(overall, 0, 100)), 1)
+
+    strongest = aspects[int(np.argmax(aspect_scores))]
+    weakest = aspects[int(np.argmin(aspect_scores))]
+    verified_share = int(round(100 * float(np.mean(weights == 1.0))))
+    summary = (
+        f"Average rating {ratings.mean():.1f}/5 across {review_count} reviews ({verified_share}% verified). "
+        f"Strongest aspect: {strongest}; weakest: {weakest}."
+    )
+    if overall >= 70:
+        recommendation = f"buy - Reviewers are consistently positive, especially about {strongest.lower()}"
+    elif overall >= 50:
+        recommendation = f"consider - Generally acceptable, but watch {weakest.lower()}"
+    else:
+        recommendation = f"avoid - Reviewers report problems, particularly with {weakest.lower()}"
+
+    return {
+        "overall_score": overall,
+        "total_reviews": review_count,
+        "aspect_analysis": aspect_analysis,
+        "summary": summary,
+        "recommendation": recommendation,
+    }
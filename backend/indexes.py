@@ -0,0 +1,124 @@
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes backing every hot query in server.py, keyed by collection name
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination order for product listings
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "reviews": [
+        # Reviews are keyed by content hash in _id; this only serves reviews
+        # stored per product before reviews were de-duplicated
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+    ],
+    "product_reviews": [
+        IndexModel([("product_id", ASCENDING), ("review_id", ASCENDING)], name="product_id_review_id", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        # Finished jobs are kept for a while so clients can collect results
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "analysis_cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        # Let Mongo expire cached analyses on its own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "activity_buckets": [
+        # Buckets are keyed by resolution and start time in _id; each
+        # resolution has its own retention
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Representative shapes of the queries served by the API. The values are
+# placeholders; only the plan chosen for the shape matters.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    {"name": "get_product", "collection": "products", "filter": {"id": ""}},
+    {"name": "get_product_review_ids", "collection": "product_reviews", "filter": {"product_id": ""}},
+    {"name": "get_reviews_by_id", "collection": "reviews", "filter": {"_id": {"$in": [""]}}},
+    {
+        "name": "list_products",
+        "collection": "products",
+        "filter": {"created_at": {"$lt": ""}},
+        "sort": [("created_at", DESCENDING), ("id", DESCENDING)],
+    },
+    {"name": "activity_timeseries", "collection": "activity_buckets", "filter": {"_id": {"$gte": "", "$lte": ""}}},
+]
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a hot query would be served by a collection scan"""
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every declared index; existing indexes are left untouched"""
+
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        created[collection_name] = await db[collection_name].create_indexes(indexes)
+    return created
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def verify_query_plans(db) -> Dict[str, List[str]]:
+    """Explain every hot query and raise QueryPlanError if any plans a COLLSCAN"""
+
+    plans = {}
+    offenders = []
+    for query in HOT_QUERIES:
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[query["name"]] = stages
+        if "COLLSCAN" in stages:
+            offenders.append(f"{query['name']} on {query['collection']}")
+
+    if offenders:
+        raise QueryPlanError("Hot queries planned as COLLSCAN: " + ", ".join(offenders))
+    return plans
+
+
+if __name__ == "__main__":
+    import asyncio
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+
+    async def main(check: bool) -> None:
+        client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+        db = client[os.environ.get("DB_NAME", "test_database")]
+        try:
+            print(f"Indexes: {await ensure_indexes(db)}")
+            if check:
+                print(f"Query plans: {await verify_query_plans(db)}")
+        finally:
+            client.close()
+
+    try:
+        asyncio.run(main("--check" in sys.argv))
+    except QueryPlanError as error:
+        print(f"❌ {error}")
+        sys.exit(1)
@@ -0,0 +1,151 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def describe_error(error: Exception) -> Any:
+    """Compact description of why a row was rejected"""
+
+    errors = getattr(error, "errors", None)
+    if callable(errors):
+        # pydantic ValidationError: field locations and messages, without the input
+        return [
+            {"loc": list(detail.get("loc", ())), "msg": detail.get("msg")}
+            for detail in errors(include_url=False, include_input=False)
+        ]
+    return str(error) or type(error).__name__
+
+
+class NdjsonIngest(Generic[T]):
+    """Validates NDJSON rows as they stream in and writes them in batches
+
+    Rows are parsed one line at a time and handed to flush in batches of
+    batch_size. At most max_in_flight flushes run at once; while they are
+    all busy no more of the body is read, so a slow database slows the
+    client down instead of filling memory. Memory use is bounded by the
+    batches in flight, whatever the size of the body.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[bytes], T],
+        # Stores a batch; returns how many of its rows were new and the
+        # errors of rows it refused, by position in the batch
+        flush: Callable[[List[T]], Awaitable[Tuple[int, Dict[int, Any]]]],
+        batch_size: int = 1000,
+        max_in_flight: int = 2,
+        max_line_bytes: int = 64 * 1024,
+        max_errors: int = 1000,
+    ):
+        self.parse = parse
+        self.flush = flush
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_line_bytes = max_line_bytes
+        self.max_errors = max_errors
+        self.lines = 0
+        self.accepted = 0
+        self.added = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.dropped_errors = 0
+        self._batch: List[T] = []
+        self._batch_lines: List[int] = []
+        self._pending: Set[asyncio.Task] = set()
+
+    def _error(self, lines, error: Any) -> None:
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": lines, "error": error})
+        else:
+            self.dropped_errors += 1
+
+    def _line(self, line: bytes) -> Optional[asyncio.Future]:
+        self.lines += 1
+        if not line.strip():
+            return None
+        try:
+            row = self.parse(line)
+        except ValueError as error:
+            self.rejected += 1
+            self._error(self.lines, describe_error(error))
+            return None
+
+        self.accepted += 1
+        self._batch.append(row)
+        self._batch_lines.append(self.lines)
+        if len(self._batch) >= self.batch_size:
+            return self._submit()
+        return None
+
+    async def _write(self, batch: List[T], lines: List[int]) -> None:
+        try:
+            added, refused = await self.flush(batch)
+        except Exception as error:
+            # The rows were valid but could not be stored; report the whole batch
+            self.accepted -= len(batch)
+            self.rejected += len(batch)
+            self._error([lines[0], lines[-1]], describe_error(error))
+            return
+        self.added += added
+        for index, error in sorted(refused.items()):
+            self.accepted -= 1
+            self.rejected += 1
+            self._error(lines[index], error)
+
+    def _submit(self) -> asyncio.Future:
+        batch, self._batch = self._batch, []
+        lines, self._batch_lines = self._batch_lines, []
+        task = asyncio.ensure_future(self._write(batch, lines))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _throttle(self) -> None:
+        while len(self._pending) >= self.max_in_flight:
+            await asyncio.wait(set(self._pending), return_when=asyncio.FIRST_COMPLETED)
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        buffer = b""
+        discarding = False
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                start = 0
+                while True:
+                    end = buffer.find(b"\n", start)
+                    if end == -1:
+                        break
+                    if discarding:
+                        # Tail of an over-long line that was already reported
+                        discarding = False
+                    elif self._line(buffer[start:end]) is not None:
+                        await self._throttle()
+                    start = end + 1
+                buffer = buffer[start:]
+
+                if len(buffer) > self.max_line_bytes:
+                    if not discarding:
+                        self.lines += 1
+                        self.rejected += 1
+                        self._error(self.lines, f"Line longer than {self.max_line_bytes} bytes")
+                        discarding = True
+                    buffer = b""
+
+            if buffer and not discarding:
+                self._line(buffer)
+            if self._batch:
+                self._submit()
+        finally:
+            if self._pending:
+                await asyncio.wait(set(self._pending))
+
+        return {
+            "lines": self.lines,
+            "accepted": self.accepted,
+            "added": self.added,
+            "duplicates": self.accepted - self.added,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.dropped_errors > 0,
+        }
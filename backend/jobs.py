@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger("trustlens.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised when the local job queue has no room for another job"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Mongo-backed job queue drained by a bounded pool of asyncio workers
+
+    Job state lives in Mongo so that any process can report on any job.
+    Each process keeps a bounded in-memory queue of job ids it intends to
+    run; a worker only runs a job after atomically claiming it, so jobs
+    picked up by several processes still run once. Jobs whose lease runs
+    out (because their process died) are put back in the queue by the
+    recovery loop of any live process, or failed once they used up their
+    attempts. A process shutting down cleanly puts its running jobs back
+    in the queue itself.
+    """
+
+    def __init__(
+        self,
+        collection,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]],
+        workers: int = 4,
+        max_queue: int = 100,
+        job_timeout: float = 120,
+        max_attempts: int = 3,
+        recovery_interval: float = 30,
+        result_ttl: float = 7 * 86400,
+    ):
+        self.collection = collection
+        self.handlers = handlers
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.recovery_interval = recovery_interval
+        self.result_ttl = result_ttl
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued_ids = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        await self.recover()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recovery_loop()))
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            # Never started, so nothing of this worker is running
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Jobs interrupted by the shutdown go back to the queue right away
+        # instead of waiting out their lease, and the interrupted attempt
+        # is not held against them
+        try:
+            await self.collection.update_many(
+                {"status": RUNNING, "worker_id": self.worker_id},
+                {
+                    "$set": {"status": QUEUED, "updated_at": _now().isoformat()},
+                    "$inc": {"attempts": -1},
+                }
+            )
+        except Exception:
+            logger.exception("Running jobs could not be requeued; they are recovered once their lease expires")
+
+    async def submit(self, job_type: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if self._queue is None or self._queue.full():
+            raise QueueFull()
+
+        now = _now()
+        job = {
+            "id": job_id or str(uuid.uuid4()),
+            "type": job_type,
+            "status": QUEUED,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        await self.collection.insert_one(dict(job))
+        self._enqueue(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one(
+            {"id": job_id},
+            {"_id": 0, "lease_expires_at": 0, "expires_at": 0}
+        )
+
+    async def wait(self, job_id: str, timeout: float, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Long-poll a job until it finishes or the timeout elapses"""
+
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return job
+            await asyncio.sleep(min(poll_interval, remaining))
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _enqueue(self, job_id: str) -> bool:
+        if job_id in self._queued_ids:
+            return True
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._queued_ids.add(job_id)
+        return True
+
+    async def recover(self) -> None:
+        """Requeue jobs whose lease expired and pick up queued jobs that nobody holds
+
+        Expired jobs that already used all their attempts are failed instead,
+        so a job that keeps killing its process is not retried forever.
+        """
+
+        now = _now()
+        await self.collection.update_many(
+            {"status": RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            {
+                "$set": {
+                    "status": FAILED,
+                    "error": "Job lease expired after its last attempt",
+                    "updated_at": now.isoformat(),
+                    "expires_at": now + timedelta(seconds=self.result_ttl),
+                }
+            }
+        )
+        await self.collection.update_many(
+            {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+            {"$set": {"status": QUEUED, "updated_at": now.isoformat()}}
+        )
+
+        room = self.max_queue - self._queue.qsize()
+        if room <= 0:
+            return
+        cursor = self.collection.find({"status": QUEUED}, {"_id": 0, "id": 1}).sort("created_at", 1)
+        for job in await cursor.to_list(length=room):
+            if not self._enqueue(job["id"]):
+                break
+
+    async def _recovery_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.recovery_interval)
+            try:
+                await self.recover()
+            except Exception:
+                logger.exception("Job recovery failed")
+
+    async def _claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one_and_update(
+            {"id": job_id, "status": QUEUED},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": self.worker_id,
+                    "updated_at": _now().isoformat(),
+                    # Leave headroom past the timeout before another process may take over
+                    "lease_expires_at": _now() + timedelta(seconds=self.job_timeout * 2),
+                },
+                "$inc": {"attempts": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _finish(self, job_id: str, update: Dict[str, Any]) -> None:
+        update["updated_at"] = _now().isoformat()
+        update["expires_at"] = _now() + timedelta(seconds=self.result_ttl)
+        await self.collection.update_one({"id": job_id, "worker_id": self.worker_id}, {"$set": update})
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued_ids.discard(job_id)
+            try:
+                job = await self._claim(job_id)
+                if job is None:
+                    # Claimed by another process or already finished
+                    continue
+                await self._run(job)
+            except Exception:
+                logger.exception("Job %s could not be processed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            handler = self.handlers[job["type"]]
+            result = await asyncio.wait_for(handler(job["payload"]), timeout=self.job_timeout)
+        except Exception as error:
+            detail = getattr(error, "detail", None) or str(error) or type(error).__name__
+            if job["attempts"] < self.max_attempts and not isinstance(error, asyncio.TimeoutError):
+                await self.collection.update_one(
+                    {"id": job["id"], "worker_id": self.worker_id},
+                    {"$set": {"status": QUEUED, "error": detail, "updated_at": _now().isoformat()}}
+                )
+                self._enqueue(job["id"])
+                return
+            await self._finish(job["id"], {"status": FAILED, "error": detail})
+            return
+
+        await self._finish(job["id"], {"status": SUCCEEDED, "result": result, "error": None})
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from metrics import LLM_CALL_LATENCY, LLM_PARSE_FAILURES, LLM_PROMPT_CHARS, LLM_PROMPT_TOKENS
+from timing import span
+
+T = TypeVar("T")
+
+# Rough characters-per-token ratio for English prose; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting"""
+
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def pack_by_budget(
+    items: Sequence[T],
+    cost: Callable[[T], int],
+    budget: int,
+    max_items: int,
+) -> List[List[T]]:
+    """Greedily pack items into groups whose total cost stays within budget
+
+    An item that is larger than the budget on its own gets a group to itself.
+    """
+
+    groups: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if current and (used + item_cost > budget or len(current) >= max_items):
+            groups.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_llm_json(response: str) -> Any:
+    """Parse a JSON reply, tolerating the markdown code fences models like to add"""
+
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    try:
+        with span("json-parse"):
+            return json.loads(text)
+    except ValueError:
+        LLM_PARSE_FAILURES.inc()
+        raise
+
+
+class AspectStreamParser:
+    """Pulls complete aspect objects out of a trust analysis reply as it streams in
+
+    Feed it the reply piece by piece; every call returns the entries of the
+    "aspect_analysis" array that became complete with that piece.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position: Optional[int] = None
+        self.depth = 0
+        self.start = 0
+        self.in_string = False
+        self.escaped = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self.buffer += text
+        aspects: List[Dict[str, Any]] = []
+        if self.finished:
+            return aspects
+
+        if self.position is None:
+            marker = self.buffer.find('"aspect_analysis"')
+            bracket = self.buffer.find("[", marker) if marker != -1 else -1
+            if bracket == -1:
+                return aspects
+            self.position = bracket + 1
+
+        index = self.position
+        while index < len(self.buffer):
+            char = self.buffer[index]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.start = index
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        aspects.append(json.loads(self.buffer[self.start:index + 1]))
+                    except ValueError:
+                        pass
+            elif char == "]" and self.depth == 0:
+                self.finished = True
+                break
+            index += 1
+        self.position = index
+        return aspects
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at capacity per period"""
+
+    def __init__(self, capacity: float, period: float = 60):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount tokens are available (0 if they are now)"""
+
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Client-side requests-per-minute and tokens-per-minute limits
+
+    Callers wait in FIFO order until both buckets can cover their request,
+    so bursts are queued locally instead of turning into provider 429s.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    delay = max(self.requests.delay(1), self.tokens.delay(tokens))
+                    if delay <= 0:
+                        break
+                    self.throttled += 1
+                    self.wait_seconds += delay
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    text = str(error).lower()
+    return "429" in text or "rate limit" in text or "resource_exhausted" in text
+
+
+class LlmClient:
+    """Long-lived LLM client shared by every analysis in the process
+
+    Provider, model, credentials and system message are resolved once.
+    Calls are bounded by a concurrency limit and a client-side rate
+    limiter. A fresh chat session is used per call because LlmChat keeps
+    conversation history per session, which must not leak between
+    analyses of unrelated products.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        provider: str,
+        model: str,
+        system_message: str,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 1_000_000,
+        max_concurrency: int = 8,
+        max_retries: int = 2,
+    ):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.system_message = system_message
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+
+    # The SDK wrapper loads every provider SDK it supports, so it is imported
+    # on first use (or by preload) rather than when the server starts
+    def preload(self) -> None:
+        """Import the provider SDKs now instead of on the first call"""
+
+        import emergentintegrations.llm.chat  # noqa: F401
+
+    def _chat(self):
+        from emergentintegrations.llm.chat import LlmChat
+
+        return LlmChat(
+            api_key=self.api_key,
+            session_id=str(uuid.uuid4()),
+            system_message=self.system_message
+        ).with_model(self.provider, self.model)
+
+    def _message(self, prompt: str):
+        from emergentintegrations.llm.chat import UserMessage
+
+        return UserMessage(text=prompt)
+
+    async def send(self, prompt: str) -> str:
+        tokens = estimate_tokens(self.system_message) + estimate_tokens(prompt)
+        LLM_PROMPT_CHARS.observe(len(prompt))
+        LLM_PROMPT_TOKENS.observe(tokens)
+        attempt = 0
+        while True:
+            await self.limiter.acquire(tokens)
+            async with self._semaphore:
+                self.in_flight += 1
+                self.calls += 1
+                started = time.perf_counter()
+                try:
+                    with span("llm"):
+                        reply = await self._chat().send_message(self._message(prompt))
+                    LLM_CALL_LATENCY.labels("success").observe(time.perf_counter() - started)
+                    return reply
+                except Exception as error:
+                    rate_limited = is_rate_limit_error(error)
+                    LLM_CALL_LATENCY.labels("rate_limited" if rate_limited else "error").observe(
+                        time.perf_counter() - started
+                    )
+                    if attempt >= self.max_retries or not rate_limited:
+                        self.errors += 1
+                        raise
+                finally:
+                    self.in_flight -= 1
+            # The provider pushed back anyway; back off before queueing again
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(2 ** attempt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the reply to prompt as it is produced
+
+        LlmChat only hands back complete replies, so today the whole reply
+        arrives as one piece. Callers consume it incrementally all the same,
+        so provider-side streaming only needs to be plugged in here.
+        """
+
+        yield await self.send(prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "retries": self.retries,
+            "errors": self.errors,
+            "rate_limiter": {
+                "waiting": self.limiter.waiting,
+                "throttled": self.limiter.throttled,
+                "wait_seconds": round(self.limiter.wait_seconds, 3),
+            },
+        }
+
+
+def _sentiment_label(score: float) -> str:
+    if score >= 60:
+        return "positive"
+    if score < 40:
+        return "negative"
+    return "neutral"
+
+
+def merge_analyses(chunks: List[Tuple[int, Dict[str, Any]]], max_key_points: int = 5) -> Dict[str, Any]:
+    """Reduce per-chunk analyses into one, weighting every chunk by its review count
+
+    chunks is a list of (review count, analysis data) pairs in chunk order.
+    An aspect carrying its own review_count is weighted by that instead, so
+    a merged analysis can itself be merged again as reviews keep arriving.
+    The merge only depends on its input, so the same chunk results always
+    produce the same analysis.
+    """
+
+    total = sum(count for count, _ in chunks)
+    overall = sum(count * float(data["overall_score"]) for count, data in chunks) / total
+
+    # Aspects keep the order in which they first appear
+    aspect_order: List[str] = []
+    aspect_weight: Dict[str, float] = {}
+    aspect_sum: Dict[str, float] = {}
+    aspect_points: Dict[str, List[Tuple[int, int, str]]] = {}
+    for index, (count, data) in enumerate(chunks):
+        for aspect in data["aspect_analysis"]:
+            name = aspect["aspect"]
+            if name not in aspect_weight:
+                aspect_order.append(name)
+                aspect_weight[name] = 0.0
+                aspect_sum[name] = 0.0
+                aspect_points[name] = []
+            weight = aspect.get("review_count") or count
+            aspect_weight[name] += weight
+            aspect_sum[name] += weight * float(aspect["score"])
+            for point in aspect["key_points"]:
+                aspect_points[name].append((-weight, index, point))
+
+    aspect_analysis = []
+    for name in aspect_order:
+        score = round(aspect_sum[name] / aspect_weight[name], 1)
+        # Points from the largest chunks first, ties broken by chunk order
+        key_points: List[str] = []
+        for _, _, point in sorted(aspect_points[name], key=lambda item: (item[0], item[1])):
+            if point not in key_points:
+                key_points.append(point)
+            if len(key_points) >= max_key_points:
+                break
+        aspect_analysis.append({
+            "aspect": name,
+            "score": score,
+            "sentiment": _sentiment_label(score),
+            "key_points": key_points,
+            "review_count": int(aspect_weight[name]),
+        })
+
+    # Narrative fields come from the chunk most representative of the merged
+    # score: closest overall score, then largest, then earliest
+    representative = min(
+        range(len(chunks)),
+        key=lambda index: (
+            abs(float(chunks[index][1]["overall_score"]) - overall),
+            -chunks[index][0],
+            index,
+        ),
+    )
+    return {
+        "overall_score": round(overall, 1),
+        "total_reviews": total,
+        "aspect_analysis": aspect_analysis,
+        "summary": chunks[representative][1]["summary"],
+        "recommendation": chunks[representative][1]["recommendation"],
+    }
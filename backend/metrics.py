@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# With several worker processes every worker writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR, and a scrape served by any worker adds them up.
+# The directory must be set before this module is imported and emptied
+# before the workers start.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "trustlens_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+LLM_CALL_LATENCY = Histogram(
+    "trustlens_llm_call_duration_seconds",
+    "Latency of individual LLM calls",
+    ["outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+LLM_PROMPT_CHARS = Histogram(
+    "trustlens_llm_prompt_chars",
+    "Size of LLM prompts in characters",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "trustlens_llm_prompt_tokens",
+    "Estimated size of LLM prompts in tokens, system message included",
+    buckets=(125, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+LLM_PARSE_FAILURES = Counter(
+    "trustlens_llm_json_parse_failures_total",
+    "LLM replies that were not valid JSON",
+)
+
+ANALYSES = Counter(
+    "trustlens_analyses_total",
+    "Trust analyses requested from the LLM, by where the result came from "
+    "(llm, cache, degraded when some review chunks failed, or fallback)",
+    ["source"],
+)
+ANALYSIS_FALLBACKS = Counter(
+    "trustlens_analysis_fallbacks_total",
+    "Analyses that fell back to the local heuristic scorer because the LLM analysis failed",
+    ["reason"],
+)
+
+MONGO_LATENCY = Histogram(
+    "trustlens_mongo_operation_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "operation", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+QUEUE_DEPTH = Gauge(
+    "trustlens_queue_depth",
+    "Work waiting in background queues",
+    ["queue"],
+    # Summed over the live workers
+    multiprocess_mode="livesum",
+)
+
+_queue_depths: Dict[str, Callable[[], float]] = {}
+
+
+def track_queue(name: str, depth: Callable[[], float]) -> None:
+    """Report depth() as the depth of a background queue
+
+    A single process reads depth() whenever metrics are scraped. Workers of
+    a multi-process deployment cannot be asked at scrape time, so they
+    publish their depths with update_queue_depths() instead.
+    """
+
+    if MULTIPROCESS:
+        _queue_depths[name] = depth
+    else:
+        QUEUE_DEPTH.labels(queue=name).set_function(depth)
+
+
+def update_queue_depths() -> None:
+    for name, depth in _queue_depths.items():
+        QUEUE_DEPTH.labels(queue=name).set(depth())
+
+
+async def publish_queue_depths(interval: float) -> None:
+    """Keep this worker's queue depths current for scrapes served by other workers"""
+
+    while True:
+        update_queue_depths()
+        await asyncio.sleep(interval)
+
+
+def mark_worker_exit() -> None:
+    """Drop the live gauges of this worker from the aggregated metrics"""
+
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render() -> Tuple[bytes, str]:
+    if not MULTIPROCESS:
+        return generate_latest(), CONTENT_TYPE_LATEST
+    update_queue_depths()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener recording the latency of every command
+
+    Listeners are called synchronously by the driver, so this only keeps
+    the collection of each started command until it finishes.
+    """
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event) -> None:
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = (
+            collection if isinstance(collection, str) else "-"
+        )
+
+    def _observe(self, event, outcome: str) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_LATENCY.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event) -> None:
+        self._observe(event, "success")
+
+    def failed(self, event) -> None:
+        self._observe(event, "error")
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request, labelled by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; templates keep
+            # ids out of the labels
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status[0]),
+            ).observe(time.perf_counter() - start)
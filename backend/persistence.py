@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from timing import span, timed
+
+# (product, reviews, trust score) documents for one analyzed product
+Analysis = Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+# Fields that make up a review's identity. The same review syndicated onto
+# several listings hashes to the same id and is stored once.
+REVIEW_CONTENT_FIELDS = ("author", "rating", "title", "content", "date", "verified", "platform")
+
+
+def review_content_id(review: Dict[str, Any]) -> str:
+    """Content hash used as the id of a stored review"""
+
+    content = {field: review.get(field) for field in REVIEW_CONTENT_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    # 128 bits is plenty to avoid collisions and keeps membership documents small
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def review_content(review: Dict[str, Any]) -> Dict[str, Any]:
+    """Product-independent review document, keyed by its content hash"""
+
+    content_id = review_content_id(review)
+    document = {field: review.get(field) for field in REVIEW_CONTENT_FIELDS}
+    document["_id"] = content_id
+    document["id"] = content_id
+    return document
+
+
+class AnalysisWriter:
+    """Persists an analyzed product, its reviews and its trust score in a constant number of round trips
+
+    The trust score lives only inside its product document, so a product
+    and its score are always read and written together.
+    """
+
+    def __init__(self, client, db, stats=None, cache=None, use_transactions: bool = False):
+        self.client = client
+        self.stats = stats
+        # Product cache to invalidate when a stored product changes
+        self.cache = cache
+        self.products = db["products"]
+        self.reviews = db["reviews"]
+        self.product_reviews = db["product_reviews"]
+        # Transactions need a replica set or sharded cluster, so they are opt-in
+        self.use_transactions = use_transactions
+
+    async def save(
+        self,
+        product: Dict[str, Any],
+        reviews: List[Dict[str, Any]],
+        trust_score: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        await self.save_many([(product, reviews, trust_score)])
+
+    async def update_trust_score(
+        self,
+        product_id: str,
+        trust_score: Dict[str, Any],
+        expected_updated_at: Optional[str] = None,
+    ) -> bool:
+        """Replace the trust score of an existing product
+
+        With expected_updated_at the score is only replaced if it was not
+        changed since it was read; False means the product is missing or
+        the caller lost the race.
+        """
+
+        query = {"id": product_id}
+        if expected_updated_at is not None:
+            query["trust_score.updated_at"] = expected_updated_at
+        with span("mongo-update-trust-score"):
+            previous = await self.products.find_one_and_update(
+                query,
+                {"$set": {"trust_score": trust_score}},
+                projection={"_id": 0, "id": 1, "trust_score.overall_score": 1},
+            )
+        if previous is None:
+            return False
+
+        if self.cache is not None:
+            await self.cache.invalidate([product_id])
+        previous_score = (previous.get("trust_score") or {}).get("overall_score")
+        if self.stats is not None:
+            await self.stats.record_rescore(previous_score, trust_score["overall_score"])
+        return True
+
+    async def link_reviews(
+        self,
+        links: List[Tuple[str, Dict[str, Any]]],
+        pending: bool = False,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Store reviews and link them to existing products
+
+        links is a list of (product id, review) pairs. Returns the pairs that
+        were not linked before, so a review submitted twice is neither
+        stored nor counted twice. With pending=True new links are marked as
+        not yet reflected in the trust score; see claim_pending_reviews.
+        """
+
+        contents, memberships = self._review_documents(links)
+        if not contents:
+            return []
+
+        await self._adopt_review_copies({product_id for product_id, _ in links})
+        _, membership_result = await asyncio.gather(
+            *self._bulk_review_writes(contents, memberships, pending=pending)
+        )
+        # Upserted indexes refer to memberships in insertion order
+        linked = list(memberships.items())
+        added = [
+            (product_id, review)
+            for (product_id, _), review in (linked[index] for index in sorted(membership_result.upserted_ids))
+        ]
+
+        if added and self.stats is not None:
+            await self.stats.record_reviews([review for _, review in added])
+        return added
+
+    async def _adopt_review_copies(self, product_ids) -> None:
+        """Link the per-product review copies of older products through product_reviews
+
+        Reads only fall back to a product's copies while it has no links, so
+        they must be linked before its first new review is. The copies are
+        already counted in the dashboard stats and the trust score, so they
+        are linked as scored and without touching the stats, then removed.
+        """
+
+        cursor = self.reviews.find({"product_id": {"$in": list(product_ids)}})
+        copies = await cursor.to_list(length=None)
+        if not copies:
+            return
+
+        contents, memberships = self._review_documents([(copy["product_id"], copy) for copy in copies])
+        await asyncio.gather(*self._bulk_review_writes(contents, memberships))
+        await self.reviews.delete_many({"_id": {"$in": [copy["_id"] for copy in copies]}})
+
+    async def claim_pending_reviews(self, product_id: str, lease_seconds: float = 300) -> Tuple[str, List[str]]:
+        """Claim the product's reviews that are linked but not yet scored
+
+        Returns a claim token and the ids of the claimed reviews. A claim
+        keeps concurrent rescores from folding the same reviews in twice;
+        one whose lease ran out (its request failed or died) is taken over.
+        """
+
+        claim = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        await self.product_reviews.update_many(
+            {
+                "product_id": product_id,
+                "pending": True,
+                "$or": [{"claimed_until": {"$exists": False}}, {"claimed_until": {"$lt": now}}],
+            },
+            {"$set": {"claim": claim, "claimed_until": now + timedelta(seconds=lease_seconds)}},
+        )
+        cursor = self.product_reviews.find({"product_id": product_id, "claim": claim}, {"_id": 0, "review_id": 1})
+        return claim, [link["review_id"] for link in await cursor.to_list(length=None)]
+
+    async def release_pending_reviews(self, product_id: str, claim: str, scored: bool) -> None:
+        """End a claim; scored reviews stop being pending, others can be claimed again"""
+
+        fields = {"claim": "", "claimed_until": ""}
+        if scored:
+            fields["pending"] = ""
+        await self.product_reviews.update_many({"product_id": product_id, "claim": claim}, {"$unset": fields})
+
+    async def save_many(self, analyses: List[Analysis]) -> None:
+        """Persist several analyzed products with one bulk write per collection"""
+
+        if not analyses:
+            return
+
+        if self.use_transactions:
+            async with await self.client.start_session() as session:
+                async with session.start_transaction():
+                    # A session must not be used by concurrent operations, so
+                    # transactional writes are issued one collection at a time.
+                    for write in self._writes(analyses, session):
+                        await write
+        else:
+            await asyncio.gather(*self._writes(analyses))
+        # New products cannot be cached yet (misses are not cached), so there
+        # is nothing to invalidate; publishing would make every other worker
+        # drop its cache on every analysis
+
+    def _writes(self, analyses: List[Analysis], session=None):
+        products = [product for product, _, _ in analyses]
+        links = [
+            (product["id"], review)
+            for product, product_reviews, _ in analyses
+            for review in product_reviews
+        ]
+
+        writes = [timed("mongo-insert-products", self.products.insert_many(products, ordered=False, session=session))]
+        writes.extend(self._review_writes(links, session))
+        if self.stats is not None:
+            writes.append(timed("mongo-update-stats", self.stats.record(analyses, session=session)))
+        return writes
+
+    def _review_writes(self, links: List[Tuple[str, Dict[str, Any]]], session=None):
+        contents, memberships = self._review_documents(links)
+        if not contents:
+            return []
+        return self._bulk_review_writes(contents, memberships, session)
+
+    def _review_documents(self, links: List[Tuple[str, Dict[str, Any]]]):
+        """Review contents by content id, and the review behind each (product id, content id) link"""
+
+        contents = {}
+        memberships = {}
+        for product_id, review in links:
+            document = review_content(review)
+            contents.setdefault(document["_id"], document)
+            memberships.setdefault((product_id, document["_id"]), review)
+        return contents, memberships
+
+    def _bulk_review_writes(
+        self,
+        contents: Dict[str, Dict[str, Any]],
+        memberships: Dict[Tuple[str, str], Any],
+        session=None,
+        pending: bool = False,
+    ):
+        """Upsert review contents once each and link them to their products
+
+        Upserts with $setOnInsert rather than inserts, so reviews that are
+        already stored are skipped without raising duplicate key errors
+        (which would also abort a transaction).
+        """
+
+        return [
+            timed("mongo-upsert-reviews", self.reviews.bulk_write(
+                [
+                    UpdateOne({"_id": content_id}, {"$setOnInsert": document}, upsert=True)
+                    for content_id, document in contents.items()
+                ],
+                ordered=False,
+                session=session,
+            )),
+            timed("mongo-link-reviews", self.product_reviews.bulk_write(
+                [
+                    UpdateOne(
+                        {"product_id": product_id, "review_id": review_id},
+                        {"$setOnInsert": {
+                            "product_id": product_id,
+                            "review_id": review_id,
+                            **({"pending": True} if pending else {}),
+                        }},
+                        upsert=True,
+                    )
+                    for product_id, review_id in memberships
+                ],
+                ordered=False,
+                session=session,
+            )),
+        ]
@@ -0,0 +1,63 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+from timing import span
+
+# Datetimes, numpy scalars and non-string keys (Mongo aggregation ids) are
+# encoded natively rather than through a Python fallback
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, or by pydantic-core for a model
+
+    Used as the app's default response class. Routes with large payloads
+    return it directly so FastAPI's jsonable_encoder pass over the content
+    is skipped as well.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            if isinstance(content, BaseModel):
+                return content.model_dump_json().encode("utf-8")
+            return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def make_etag(*parts: str) -> str:
+    """Weak ETag derived from the values that identify a resource version
+
+    The compression middleware serves identity, gzip and br encodings of
+    the same response, which must not share a strong validator.
+    """
+
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag
+
+    If-None-Match uses weak comparison, so W/ prefixes are ignored on both
+    sides.
+    """
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
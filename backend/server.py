@@ -1,20 +1,117 @@
 import os
 import uuid
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from brotli_asgi import BrotliMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from typing import List, Optional, Dict, Any, Literal, Callable, Awaitable, Tuple
 import json
-from datetime import datetime
+import hashlib
+import base64
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, urlunsplit
 import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from pymongo import DESCENDING
+from cache import AnalysisCache, CacheInvalidator, ProductCache, VersionCounterInvalidator, analysis_cache_key
+from concurrency import SingleFlight
+from llm import LlmClient, AspectStreamParser, estimate_tokens, merge_analyses, pack_by_budget, parse_llm_json
+from persistence import AnalysisWriter
+from indexes import ensure_indexes, verify_query_plans
+from stats import DashboardStats
+from activity import DAY, HOUR, MINUTE, STEPS, ActivityRollups, as_utc
+from jobs import JobQueue, QueueFull
+from ingest import NdjsonIngest
+from metrics import ANALYSES, ANALYSIS_FALLBACKS, MULTIPROCESS as MULTIPROCESS_METRICS, MongoCommandMetrics, RequestMetricsMiddleware
+from metrics import mark_worker_exit, publish_queue_depths, render as render_metrics, track_queue
+from responses import FastJSONResponse, etag_matches, make_etag, not_modified
+from timing import ServerTimingMiddleware, span
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Trust Lens API", version="1.0.0")
+logger = logging.getLogger("trustlens")
+
+async def prepare_database() -> None:
+    """Startup work that needs Mongo, ending with starting the job workers"""
+    
+    # Index bootstrap; MONGO_VERIFY_QUERY_PLANS=true refuses to start if any
+    # hot query would still be served by a collection scan
+    if os.environ.get("MONGO_CREATE_INDEXES", "true").lower() == "true":
+        await ensure_indexes(db)
+    if os.environ.get("MONGO_VERIFY_QUERY_PLANS", "false").lower() == "true":
+        plans = await verify_query_plans(db)
+        logger.info("Query plans verified: %s", plans)
+    # Seed the materialized dashboard stats for databases that predate them
+    if not await dashboard_stats.exists():
+        await dashboard_stats.rebuild()
+    await analysis_jobs.start()
+
+async def prepare_database_when_reachable() -> None:
+    """Retry the Mongo startup work until it succeeds, then accept traffic"""
+    
+    global accepting_traffic
+    while True:
+        await asyncio.sleep(MONGO_STARTUP_RETRY_SECONDS)
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), MONGO_STARTUP_TIMEOUT_SECONDS)
+            await prepare_database()
+        except Exception:
+            logger.warning(
+                "MongoDB is still not ready, retrying in %g s",
+                MONGO_STARTUP_RETRY_SECONDS, exc_info=True
+            )
+            continue
+        logger.info("MongoDB is reachable again, accepting traffic")
+        accepting_traffic = True
+        return
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global accepting_traffic
+    # Runs once in every worker process. The client was created without
+    # connecting. A worker that cannot reach Mongo within
+    # MONGO_STARTUP_TIMEOUT_SECONDS still starts, but fails /api/ready and
+    # keeps retrying in the background: a worker that exited here would
+    # not be replaced by the process manager.
+    database_task = None
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), MONGO_STARTUP_TIMEOUT_SECONDS)
+    except Exception:
+        logger.warning("MongoDB is not reachable at startup, not ready until it is", exc_info=True)
+        database_task = asyncio.create_task(prepare_database_when_reachable())
+    else:
+        await prepare_database()
+    # Build the shared LLM client up front; without a key analyses report the error per request
+    if os.environ.get("GOOGLE_API_KEY"):
+        get_llm_client()
+    # Warm-up runs in the background so it does not hold back the port
+    warm_up_task = asyncio.create_task(warm_up()) if WARM_UP_ON_STARTUP else None
+    metrics_task = None
+    if MULTIPROCESS_METRICS:
+        metrics_task = asyncio.create_task(publish_queue_depths(METRICS_PUBLISH_INTERVAL_SECONDS))
+    accepting_traffic = database_task is None
+    yield
+    # Fail readiness checks first so load balancers drain this worker
+    accepting_traffic = False
+    for task in (database_task, warm_up_task, metrics_task):
+        if task is not None:
+            task.cancel()
+    await analysis_jobs.stop()
+    client.close()
+    mark_worker_exit()
+
+app = FastAPI(
+    title="Trust Lens API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS configuration
 app.add_middleware(
@@ -25,17 +122,176 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression: brotli when the client accepts it, gzip otherwise.
+# Small bodies are not worth the CPU, and the SSE stream must not be
+# buffered by the compressor.
+app.add_middleware(
+    BrotliMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "1024")),
+    quality=int(os.environ.get("BROTLI_QUALITY", "4")),
+    gzip_fallback=True,
+    excluded_handlers=[r"^/api/analyze-product/stream$"],
+)
+
+# Per-request span breakdown in a Server-Timing header. Profiles are taken
+# of sampled requests and, with PROFILING_ENABLED=true, of requests sent
+# with an X-Profile: true header.
+app.add_middleware(
+    ServerTimingMiddleware,
+    enabled=os.environ.get("SERVER_TIMING_ENABLED", "true").lower() == "true",
+    profiling_enabled=os.environ.get("PROFILING_ENABLED", "false").lower() == "true",
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+    profile_dir=os.environ.get("PROFILE_DIR", "profiles"),
+)
+
+# Request latency per route, compression included, reported by /api/metrics
+app.add_middleware(RequestMetricsMiddleware)
+
 # Database setup
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
 
-client = AsyncIOMotorClient(MONGO_URL)
+# Pool settings apply per worker process: a node running WEB_CONCURRENCY
+# workers opens up to WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE connections.
+# Unset timeouts keep the driver defaults.
+def mongo_client_options() -> Dict[str, Any]:
+    options = {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+    }
+    for option, variable in (
+        ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS"),
+        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS"),
+        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS"),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    ):
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+# connect=False defers sockets and monitor threads to the first operation,
+# inside a worker's event loop, so importing this module before forking
+# (gunicorn --preload) is safe. The lifespan hook pings and closes it.
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    connect=False,
+    event_listeners=[MongoCommandMetrics()],
+    **mongo_client_options(),
+)
 db = client[DB_NAME]
 
+# Number of server worker processes sharing this node. Set by the __main__
+# launcher, or by gunicorn/uvicorn through the same variable.
+WEB_CONCURRENCY = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+# Readiness: true between startup and shutdown of this worker
+accepting_traffic = False
+READINESS_TIMEOUT_SECONDS = float(os.environ.get("READINESS_TIMEOUT_SECONDS", "2"))
+# How long startup waits for Mongo, and how often it retries when it was not reachable
+MONGO_STARTUP_TIMEOUT_SECONDS = float(os.environ.get("MONGO_STARTUP_TIMEOUT_SECONDS", "5"))
+MONGO_STARTUP_RETRY_SECONDS = float(os.environ.get("MONGO_STARTUP_RETRY_SECONDS", "5"))
+
+# Optional warm-up after startup: imports the LLM provider SDKs and the local
+# scorer and opens WARM_UP_MONGO_CONNECTIONS pooled connections, so the
+# first requests of a fresh worker do not pay for them
+WARM_UP_ON_STARTUP = os.environ.get("WARM_UP_ON_STARTUP", "false").lower() == "true"
+WARM_UP_MONGO_CONNECTIONS = int(os.environ.get("WARM_UP_MONGO_CONNECTIONS", "4"))
+
+# How often workers publish queue depths for multi-process metrics
+METRICS_PUBLISH_INTERVAL_SECONDS = float(os.environ.get("METRICS_PUBLISH_INTERVAL_SECONDS", "5"))
+
 # Collections
 products_collection = db["products"]
 reviews_collection = db["reviews"]
-trust_scores_collection = db["trust_scores"]
+product_reviews_collection = db["product_reviews"]
+analysis_cache_collection = db["analysis_cache"]
+jobs_collection = db["jobs"]
+cache_versions_collection = db["cache_versions"]
+
+# Per-minute, per-hour and per-day activity buckets behind the dashboard's
+# recent activity and time series, kept for the given number of days
+activity_rollups = ActivityRollups(db, retention={
+    MINUTE: timedelta(days=float(os.environ.get("ACTIVITY_MINUTE_RETENTION_DAYS", "2"))),
+    HOUR: timedelta(days=float(os.environ.get("ACTIVITY_HOUR_RETENTION_DAYS", "90"))),
+    DAY: timedelta(days=float(os.environ.get("ACTIVITY_DAY_RETENTION_DAYS", "730"))),
+})
+TIMESERIES_MAX_POINTS = int(os.environ.get("TIMESERIES_MAX_POINTS", "1500"))
+
+# Materialized dashboard counters, updated by every analysis write
+dashboard_stats = DashboardStats(db, activity=activity_rollups)
+
+# Read-through cache for hot product documents. With several workers,
+# PRODUCT_CACHE_INVALIDATION=version shares invalidations through a version
+# counter in Mongo; "local" skips the polling for single-process deployments.
+if os.environ.get("PRODUCT_CACHE_INVALIDATION", "version") == "version":
+    product_cache_invalidator = VersionCounterInvalidator(
+        cache_versions_collection,
+        "products",
+        poll_interval=float(os.environ.get("PRODUCT_CACHE_POLL_SECONDS", "1")),
+    )
+else:
+    product_cache_invalidator = CacheInvalidator()
+product_cache = ProductCache(
+    products_collection,
+    max_entries=int(os.environ.get("PRODUCT_CACHE_MAX_ENTRIES", "4096")),
+    max_bytes=int(os.environ.get("PRODUCT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl_seconds=float(os.environ.get("PRODUCT_CACHE_TTL_SECONDS", "60")),
+    invalidator=product_cache_invalidator,
+)
+
+# Bulk writer for analysis results; set MONGO_WRITE_TRANSACTIONS=true on a
+# replica set to make the product, review and trust score writes atomic
+analysis_writer = AnalysisWriter(
+    client,
+    db,
+    stats=dashboard_stats,
+    cache=product_cache,
+    use_transactions=os.environ.get("MONGO_WRITE_TRANSACTIONS", "false").lower() == "true",
+)
+
+# Cache-Control sent with ETag-validated product and review responses; the
+# default makes clients revalidate, which is answered with a cheap 304
+HTTP_CACHE_CONTROL = os.environ.get("HTTP_CACHE_CONTROL", "no-cache")
+
+# Bulk review loads: rows per Mongo batch and batches written concurrently
+# before the request body stops being read
+BULK_REVIEW_BATCH_SIZE = int(os.environ.get("BULK_REVIEW_BATCH_SIZE", "1000"))
+BULK_REVIEW_MAX_IN_FLIGHT = int(os.environ.get("BULK_REVIEW_MAX_IN_FLIGHT", "2"))
+
+# Keyset order for product listings; backed by the products created_at/id index
+PRODUCT_PAGE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+# LLM configuration. Bump PROMPT_VERSION whenever the analysis prompt changes
+# so that cached analyses produced by the old prompt are no longer served.
+LLM_PROVIDER = "gemini"
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini-2.0-flash")
+PROMPT_VERSION = "v1"
+
+# Batch analysis: how many review sets share one prompt and how many
+# batch prompts may be in flight at once
+BATCH_PROMPT_TOKEN_BUDGET = int(os.environ.get("BATCH_PROMPT_TOKEN_BUDGET", "6000"))
+BATCH_MAX_SETS_PER_PROMPT = int(os.environ.get("BATCH_MAX_SETS_PER_PROMPT", "10"))
+BATCH_LLM_CONCURRENCY = int(os.environ.get("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_MAX_PRODUCTS = int(os.environ.get("BATCH_MAX_PRODUCTS", "1000"))
+
+# Review sets larger than this are split into chunks that are analyzed in
+# parallel and merged, instead of being sent as one ever-growing prompt
+ANALYSIS_CHUNK_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_CHUNK_TOKEN_BUDGET", "8000"))
+ANALYSIS_CHUNK_CONCURRENCY = int(os.environ.get("ANALYSIS_CHUNK_CONCURRENCY", "4"))
+
+# Shared LLM client, created by the lifespan hook (or on first use)
+llm_client: Optional[LlmClient] = None
+
+# Analysis cache
+analysis_cache = AnalysisCache(
+    analysis_cache_collection,
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", "86400")),
+)
+
+# Concurrent analyze requests for the same product share one analysis
+analysis_flight = SingleFlight()
 
 # Pydantic models
 class ProductRequest(BaseModel):
@@ -43,6 +299,28 @@ class ProductRequest(BaseModel):
     product_name: Optional[str] = None
     product_description: Optional[str] = None
 
+def canonical_request_key(request: ProductRequest) -> str:
+    """Stable key identifying equivalent product analysis requests"""
+    
+    url = (request.product_url or "").strip()
+    if url:
+        # Scheme and host are case-insensitive; fragments and trailing slashes are noise
+        parts = urlsplit(url)
+        url = urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/"),
+            parts.query,
+            ""
+        ))
+    
+    canonical = {
+        "url": url,
+        "name": " ".join((request.product_name or "").split()).casefold(),
+        "description": " ".join((request.product_description or "").split())
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
 class Review(BaseModel):
     id: str
     product_id: str
@@ -59,6 +337,9 @@ class AspectAnalysis(BaseModel):
     score: float
     sentiment: str
     key_points: List[str]
+    # Reviews the score averages over, when they differ from the total;
+    # kept so incremental analyses can be merged in as running averages
+    review_count: Optional[int] = None
 
 class TrustScore(BaseModel):
     product_id: str
@@ -69,6 +350,20 @@ class TrustScore(BaseModel):
     recommendation: str
     updated_at: str
 
+class ReviewInput(BaseModel):
+    author: str
+    rating: int
+    title: str
+    content: str
+    date: str
+    verified: bool = False
+    platform: str
+
+class ReviewRow(ReviewInput):
+    """One line of a bulk review load; stored reviews are keyed by content, so id is optional"""
+    product_id: str
+    id: Optional[str] = None
+
 class Product(BaseModel):
     id: str
     name: str
@@ -77,6 +372,33 @@ class Product(BaseModel):
     trust_score: Optional[TrustScore] = None
     created_at: str
 
+class ProductSummary(BaseModel):
+    id: str
+    name: str
+    overall_score: Optional[float] = None
+    recommendation: Optional[str] = None
+    created_at: str
+
+# Only the fields a ProductSummary needs are read from Mongo for listings
+PRODUCT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "created_at": 1,
+    "trust_score.overall_score": 1,
+    "trust_score.recommendation": 1
+}
+
+def summarize_product(document: Dict[str, Any]) -> Dict[str, Any]:
+    trust_score = document.get("trust_score") or {}
+    return ProductSummary(
+        id=document["id"],
+        name=document["name"],
+        overall_score=trust_score.get("overall_score"),
+        recommendation=trust_score.get("recommendation"),
+        created_at=document["created_at"]
+    ).dict()
+
 # Mock review data for different platforms
 MOCK_REVIEWS = [
     {
@@ -131,41 +453,12 @@ MOCK_REVIEWS = [
     }
 ]
 
-async def generate_trust_analysis(product_id: str, reviews: List[Dict]) -> TrustScore:
-    """Generate AI-powered trust analysis using Gemini"""
-    
-    # Initialize Gemini chat
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Google API key not configured")
-    
-    session_id = str(uuid.uuid4())
-    
-    chat = LlmChat(
-        api_key=api_key,
-        session_id=session_id,
-        system_message="You are a product review analysis expert. Analyze reviews and provide detailed sentiment analysis with trust scores."
-    ).with_model("gemini", "gemini-2.0-flash")
-    
-    # Prepare reviews for analysis
-    review_text = ""
-    for review in reviews:
-        review_text += f"Rating: {review['rating']}/5\n"
-        review_text += f"Title: {review['title']}\n"
-        review_text += f"Content: {review['content']}\n"
-        review_text += f"Platform: {review['platform']}\n"
-        review_text += f"Verified: {review['verified']}\n\n"
-    
-    # Create analysis prompt
-    analysis_prompt = f"""
-    Analyze these product reviews and provide a comprehensive trust analysis:
-    
-    {review_text}
-    
-    Please provide your analysis in the following JSON format:
-    {{
+ANALYSIS_SYSTEM_MESSAGE = "You are a product review analysis expert. Analyze reviews and provide detailed sentiment analysis with trust scores."
+
+# JSON shape of one trust analysis, shared by the single and batch prompts
+ANALYSIS_JSON_FIELDS = """
         "overall_score": 0-100,
-        "total_reviews": {len(reviews)},
+        "total_reviews": {total_reviews},
         "aspect_analysis": [
             {{
                 "aspect": "Quality",
@@ -187,9 +480,9 @@ async def generate_trust_analysis(product_id: str, reviews: List[Dict]) -> Trust
             }}
         ],
         "summary": "Brief summary of overall findings",
-        "recommendation": "buy/consider/avoid with explanation"
-    }}
-    
+        "recommendation": "buy/consider/avoid with explanation\""""
+
+ANALYSIS_FOCUS = """
     Focus on analyzing:
     1. Overall product quality based on reviews
     2. Delivery experience
@@ -199,73 +492,556 @@ async def generate_trust_analysis(product_id: str, reviews: List[Dict]) -> Trust
     
     Provide scores out of 100 and detailed key points for each aspect.
     """
+
+def format_reviews(reviews: List[Dict]) -> str:
+    """Render reviews as prompt text"""
     
-    try:
-        # Send analysis request to Gemini
-        response = await chat.send_message(UserMessage(text=analysis_prompt))
+    return "".join(format_review(review) for review in reviews)
+
+def format_review(review: Dict) -> str:
+    return (
+        f"Rating: {review['rating']}/5\n"
+        f"Title: {review['title']}\n"
+        f"Content: {review['content']}\n"
+        f"Platform: {review['platform']}\n"
+        f"Verified: {review['verified']}\n\n"
+    )
+
+def build_analysis_prompt(reviews: List[Dict]) -> str:
+    """Build the trust analysis prompt for a set of reviews"""
+    
+    review_text = format_reviews(reviews)
+    fields = ANALYSIS_JSON_FIELDS.format(total_reviews=len(reviews))
+    
+    # Create analysis prompt
+    return f"""
+    Analyze these product reviews and provide a comprehensive trust analysis:
+    
+    {review_text}
+    
+    Please provide your analysis in the following JSON format:
+    {{{fields}
+    }}
+    {ANALYSIS_FOCUS}"""
+
+def build_batch_analysis_prompt(review_sets: List[tuple]) -> str:
+    """Build one prompt analyzing several independent review sets
+    
+    review_sets is a list of (reference, reviews) pairs; the model is asked
+    to echo each reference so results can be matched back.
+    """
+    
+    sections = []
+    for reference, reviews in review_sets:
+        sections.append(f"=== Review set {reference} ===\n{format_reviews(reviews)}")
+    sets_text = "\n".join(sections)
+    fields = ANALYSIS_JSON_FIELDS.format(total_reviews="<number of reviews in the set>")
+    
+    return f"""
+    Analyze each of the following review sets independently and provide a comprehensive trust analysis for every set:
+    
+    {sets_text}
+    
+    Please provide your analysis as a single JSON object in the following format, with one entry per review set:
+    {{
+        "results": [
+            {{
+        "review_set": "<review set reference>",{fields}
+            }}
+        ]
+    }}
+    {ANALYSIS_FOCUS}"""
+
+def build_trust_score(product_id: str, analysis_data: Dict[str, Any]) -> TrustScore:
+    """Create a TrustScore from parsed analysis data"""
+    
+    return TrustScore(
+        product_id=product_id,
+        overall_score=analysis_data["overall_score"],
+        total_reviews=analysis_data["total_reviews"],
+        aspect_analysis=[
+            AspectAnalysis(
+                aspect=aspect["aspect"],
+                score=aspect["score"],
+                sentiment=aspect["sentiment"],
+                key_points=aspect["key_points"],
+                review_count=aspect.get("review_count")
+            ) for aspect in analysis_data["aspect_analysis"]
+        ],
+        summary=analysis_data["summary"],
+        recommendation=analysis_data["recommendation"],
+        updated_at=datetime.now().isoformat()
+    )
+
+def fallback_trust_score(product_id: str, reviews: List[Dict]) -> TrustScore:
+    """Local heuristic analysis, used for fast mode and when the AI analysis fails"""
+    
+    # numpy is only loaded once something is scored locally
+    from heuristics import score_reviews
+    
+    with span("local-score"):
+        return build_trust_score(product_id, score_reviews(reviews))
+
+def get_llm_client() -> LlmClient:
+    """Return the process-wide LLM client, creating it on first use"""
+    
+    global llm_client
+    if llm_client is None:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=500, detail="Google API key not configured")
         
-        # Parse the JSON response
-        analysis_data = json.loads(response.strip())
+        llm_client = LlmClient(
+            api_key=api_key,
+            provider=LLM_PROVIDER,
+            model=LLM_MODEL,
+            system_message=ANALYSIS_SYSTEM_MESSAGE,
+            # The provider quota is shared by every worker on the node
+            requests_per_minute=float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60")) / WEB_CONCURRENCY,
+            tokens_per_minute=float(os.environ.get("LLM_TOKENS_PER_MINUTE", "1000000")) / WEB_CONCURRENCY,
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+        )
+    return llm_client
+
+def preload_modules() -> None:
+    import heuristics  # noqa: F401
+    
+    if os.environ.get("GOOGLE_API_KEY"):
+        get_llm_client().preload()
+
+async def warm_up() -> None:
+    """Pre-initialize lazily loaded modules and the Mongo pool"""
+    
+    start = time.perf_counter()
+    try:
+        # Imports hold the GIL but not the event loop
+        await asyncio.to_thread(preload_modules)
+        # Concurrent pings make the pool open that many connections
+        await asyncio.gather(*(client.admin.command("ping") for _ in range(WARM_UP_MONGO_CONNECTIONS)))
+    except Exception:
+        logger.exception("Warm-up failed; the first requests will initialize lazily")
+        return
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
+
+async def send_llm_prompt(prompt: str) -> str:
+    """Send a prompt to Gemini through the shared, rate-limited client"""
+    
+    return await get_llm_client().send(prompt)
+
+def normalize_analysis(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate LLM analysis data, keeping only the fields a TrustScore uses"""
+    
+    return build_trust_score("", analysis_data).dict(exclude={"product_id", "updated_at"})
+
+async def request_llm_analysis(
+    reviews: List[Dict],
+    on_aspect: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """Ask the LLM for an analysis, map-reducing review sets too large for one prompt
+    
+    When on_aspect is given the reply is streamed and each aspect is passed
+    to it as soon as it has been parsed.
+    """
+    
+    if sum(estimate_tokens(format_review(review)) for review in reviews) > ANALYSIS_CHUNK_TOKEN_BUDGET:
+        return await request_chunked_analysis(reviews)
+    
+    # Send analysis request to Gemini
+    prompt = build_analysis_prompt(reviews)
+    if on_aspect is None:
+        response = await send_llm_prompt(prompt)
+    else:
+        parser = AspectStreamParser()
+        pieces = []
+        async for piece in get_llm_client().stream(prompt):
+            pieces.append(piece)
+            for aspect in parser.feed(piece):
+                await on_aspect(aspect)
+        response = "".join(pieces)
+    
+    # Parse the JSON response
+    return normalize_analysis(parse_llm_json(response))
+
+async def request_chunked_analysis(reviews: List[Dict]) -> Dict[str, Any]:
+    """Analyze token-budgeted chunks of reviews in parallel and merge the results
+    
+    Chunks that fail are left out of the merge and counted in
+    failed_chunks; the analysis only fails if every chunk does.
+    """
+    
+    chunks = pack_by_budget(
+        reviews,
+        lambda review: estimate_tokens(format_review(review)),
+        budget=ANALYSIS_CHUNK_TOKEN_BUDGET,
+        max_items=len(reviews)
+    )
+    semaphore = asyncio.Semaphore(ANALYSIS_CHUNK_CONCURRENCY)
+    
+    async def analyze_chunk(chunk: List[Dict]) -> Optional[tuple]:
+        async with semaphore:
+            try:
+                response = await send_llm_prompt(build_analysis_prompt(chunk))
+                return len(chunk), normalize_analysis(parse_llm_json(response))
+            except HTTPException:
+                raise
+            except Exception:
+                logger.warning("Chunk of %d reviews could not be analyzed", len(chunk))
+                return None
+    
+    results = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
+    completed = [result for result in results if result is not None]
+    if not completed:
+        raise ValueError("No review chunk could be analyzed")
+    
+    merged = merge_analyses(completed)
+    merged["total_reviews"] = len(reviews)
+    merged["failed_chunks"] = len(chunks) - len(completed)
+    return merged
+
+async def cached_trust_analysis(
+    product_id: str,
+    reviews: List[Dict],
+    cache_key: Optional[str] = None
+) -> Optional[TrustScore]:
+    """The cached LLM analysis of a review set, if there is one"""
+    
+    cache_key = cache_key or analysis_cache_key(reviews, LLM_MODEL, PROMPT_VERSION)
+    with span("analysis-cache"):
+        cached_analysis = await analysis_cache.get(cache_key)
+    if cached_analysis is None:
+        return None
+    ANALYSES.labels("cache").inc()
+    return build_trust_score(product_id, cached_analysis)
+
+async def generate_trust_analysis(
+    product_id: str,
+    reviews: List[Dict],
+    on_aspect: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> TrustScore:
+    """Generate AI-powered trust analysis using Gemini"""
+    
+    # Serve repeated review sets from the cache without calling the LLM
+    cache_key = analysis_cache_key(reviews, LLM_MODEL, PROMPT_VERSION)
+    cached_score = await cached_trust_analysis(product_id, reviews, cache_key)
+    if cached_score is not None:
+        return cached_score
+    
+    try:
+        analysis_data = await request_llm_analysis(reviews, on_aspect)
         
         # Create TrustScore object
-        trust_score = TrustScore(
-            product_id=product_id,
-            overall_score=analysis_data["overall_score"],
-            total_reviews=analysis_data["total_reviews"],
-            aspect_analysis=[
-                AspectAnalysis(
-                    aspect=aspect["aspect"],
-                    score=aspect["score"],
-                    sentiment=aspect["sentiment"],
-                    key_points=aspect["key_points"]
-                ) for aspect in analysis_data["aspect_analysis"]
-            ],
-            summary=analysis_data["summary"],
-            recommendation=analysis_data["recommendation"],
-            updated_at=datetime.now().isoformat()
-        )
+        trust_score = build_trust_score(product_id, analysis_data)
         
+    except HTTPException:
+        raise
+    except Exception as error:
+        # Fallback analysis if AI fails
+        reason = fallback_reason(error)
+        ANALYSES.labels("fallback").inc()
+        ANALYSIS_FALLBACKS.labels(reason).inc()
+        logger.warning("AI analysis of product %s failed (%s), using local scoring", product_id, reason, exc_info=True)
+        return fallback_trust_score(product_id, reviews)
+    
+    if analysis_data.get("failed_chunks"):
+        # Some reviews went unanalyzed; the result is served but not cached
+        # so the next request for this review set retries the failed chunks
+        ANALYSES.labels("degraded").inc()
         return trust_score
+    
+    ANALYSES.labels("llm").inc()
+    
+    # Only complete LLM analyses are cached, never partial ones or the fallback
+    await analysis_cache.set(
+        cache_key,
+        trust_score.dict(exclude={"product_id", "updated_at"})
+    )
+    
+    return trust_score
+
+def fallback_reason(error: Exception) -> str:
+    # Replies that are not valid analysis JSON are told apart from failed
+    # calls so both can be alerted on
+    return "parse_error" if isinstance(error, (ValueError, KeyError, TypeError)) else "llm_error"
+
+async def generate_batch_trust_analyses(
+    review_sets: Dict[str, List[Dict]]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """Analyze many review sets, packing several into each LLM prompt
+    
+    review_sets maps analysis cache keys to reviews. Returns the analysis
+    data for every key, and the fallback reason of the sets whose prompt
+    failed or whose result was garbled; sets missing from both were
+    skipped by the model. The caller falls back for every set left out.
+    """
+    
+    analyses = {}
+    failures = {}
+    pending = []
+    for cache_key, reviews in review_sets.items():
+        cached_analysis = await analysis_cache.get(cache_key)
+        if cached_analysis is not None:
+            ANALYSES.labels("cache").inc()
+            analyses[cache_key] = cached_analysis
+        else:
+            pending.append((cache_key, reviews))
+    
+    # Review sets too large for a shared prompt are map-reduced on their own
+    oversized = [
+        (cache_key, reviews) for cache_key, reviews in pending
+        if estimate_tokens(format_reviews(reviews)) > ANALYSIS_CHUNK_TOKEN_BUDGET
+    ]
+    pending = [item for item in pending if item not in oversized]
+    
+    async def analyze_oversized(cache_key: str, reviews: List[Dict]) -> None:
+        try:
+            analysis_data = await request_chunked_analysis(reviews)
+        except HTTPException:
+            raise
+        except Exception as error:
+            failures[cache_key] = fallback_reason(error)
+            logger.warning(
+                "AI analysis of review set %s failed (%s), using local scoring",
+                cache_key, failures[cache_key], exc_info=True
+            )
+            return
+        analyses[cache_key] = analysis_data
+        if analysis_data.get("failed_chunks"):
+            ANALYSES.labels("degraded").inc()
+            return
+        ANALYSES.labels("llm").inc()
+        await analysis_cache.set(cache_key, analysis_data)
+    
+    batches = pack_by_budget(
+        pending,
+        lambda item: estimate_tokens(format_reviews(item[1])),
+        budget=BATCH_PROMPT_TOKEN_BUDGET,
+        max_items=BATCH_MAX_SETS_PER_PROMPT
+    )
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    
+    async def analyze_batch(batch: List[tuple]) -> None:
+        # Short positional references keep the prompt small and easy to echo
+        references = {str(index + 1): cache_key for index, (cache_key, _) in enumerate(batch)}
+        prompt = build_batch_analysis_prompt(
+            [(str(index + 1), reviews) for index, (_, reviews) in enumerate(batch)]
+        )
+        async with semaphore:
+            try:
+                response = await send_llm_prompt(prompt)
+                results = parse_llm_json(response)["results"]
+                if not isinstance(results, list):
+                    raise TypeError(f"results is a {type(results).__name__}, not a list")
+            except HTTPException:
+                raise
+            except Exception as error:
+                reason = fallback_reason(error)
+                failures.update((cache_key, reason) for cache_key, _ in batch)
+                logger.warning(
+                    "AI analysis of %d batched review sets failed (%s), using local scoring",
+                    len(batch), reason, exc_info=True
+                )
+                return
         
-    except Exception as e:
-        # Fallback analysis if AI fails
-        fallback_score = TrustScore(
-            product_id=product_id,
-            overall_score=75,
-            total_reviews=len(reviews),
-            aspect_analysis=[
-                AspectAnalysis(
-                    aspect="Quality",
-                    score=78,
-                    sentiment="positive",
-                    key_points=["Generally good quality", "Some mixed experiences"]
-                ),
-                AspectAnalysis(
-                    aspect="Delivery",
-                    score=72,
-                    sentiment="neutral",
-                    key_points=["Mixed delivery times", "Most orders arrive safely"]
-                ),
-                AspectAnalysis(
-                    aspect="Customer Service",
-                    score=65,
-                    sentiment="neutral",
-                    key_points=["Variable response times", "Generally helpful"]
+        # A garbled result costs the set it garbled, never the whole batch
+
+        for result in results:
+            if not isinstance(result, dict):
+                continue
+            cache_key = references.get(str(result.get("review_set")))
+            if cache_key is None:
+                continue
+            try:
+                analysis_data = normalize_analysis(result)
+            except Exception as error:
+                failures[cache_key] = fallback_reason(error)
+                logger.warning(
+                    "AI analysis of review set %s was garbled (%s), using local scoring",
+                    cache_key, failures[cache_key], exc_info=True
                 )
-            ],
-            summary="Mixed reviews with generally positive sentiment",
-            recommendation="consider - Good product with some areas for improvement",
-            updated_at=datetime.now().isoformat()
-        )
-        return fallback_score
+                continue
+            ANALYSES.labels("llm").inc()
+            analyses[cache_key] = analysis_data
+            await analysis_cache.set(cache_key, analysis_data)
+    
+    await asyncio.gather(
+        *(analyze_batch(batch) for batch in batches),
+        *(analyze_oversized(cache_key, reviews) for cache_key, reviews in oversized)
+    )
+    return analyses, failures
+
+async def load_product_review_ids(product_id: str, limit: Optional[int] = None) -> List[str]:
+    """Ids of the reviews linked to a product, read from the product_reviews index alone"""
+    
+    cursor = product_reviews_collection.find({"product_id": product_id}, {"_id": 0, "review_id": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+    return [link["review_id"] for link in await cursor.to_list(length=limit)]
+
+async def load_product_reviews(
+    product_id: str,
+    limit: Optional[int] = None,
+    review_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Resolve a product's reviews through the product_reviews membership collection"""
+    
+    if review_ids is None:
+        review_ids = await load_product_review_ids(product_id, limit)
+    
+    if not review_ids:
+        # Products analyzed before reviews were de-duplicated own their review copies
+        legacy_cursor = reviews_collection.find({"product_id": product_id}, {"_id": 0})
+        return await legacy_cursor.to_list(length=limit)
+    
+    cursor = reviews_collection.find({"_id": {"$in": review_ids}}, {"_id": 0})
+    reviews_by_id = {review["id"]: review for review in await cursor.to_list(length=len(review_ids))}
+    
+    # Shared review documents carry no product; report them under this one
+    return [
+        {**reviews_by_id[review_id], "product_id": product_id}
+        for review_id in review_ids if review_id in reviews_by_id
+    ]
+
+async def run_analysis_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler for asynchronous product analyses"""
+    
+    mode = payload.get("mode", "llm")
+    request = ProductRequest(**{key: value for key, value in payload.items() if key != "mode"})
+    product, _ = await analyze_once(request, mode)
+    return product.dict()
+
+async def run_refinement_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler replacing a product's local trust score with the LLM analysis"""
+    
+    product_id = payload["product_id"]
+    reviews = await load_product_reviews(product_id)
+    
+    trust_score = await generate_trust_analysis(product_id, reviews)
+    await analysis_writer.update_trust_score(product_id, trust_score.dict())
+    return trust_score.dict()
+
+# Background analysis jobs
+analysis_jobs = JobQueue(
+    jobs_collection,
+    {
+        "analyze_product": run_analysis_job,
+        "refine_trust_score": run_refinement_job
+    },
+    workers=int(os.environ.get("ANALYSIS_WORKERS", "4")),
+    max_queue=int(os.environ.get("ANALYSIS_QUEUE_SIZE", "100")),
+    job_timeout=float(os.environ.get("ANALYSIS_JOB_TIMEOUT_SECONDS", "120")),
+)
+
+# Queue depths are read when metrics are scraped
+track_queue("analysis_jobs", lambda: analysis_jobs.depth())
+track_queue("llm_rate_limiter", lambda: llm_client.limiter.waiting if llm_client else 0)
+track_queue("llm_in_flight", lambda: llm_client.in_flight if llm_client else 0)
+track_queue("analysis_streams", lambda: len(streaming_tasks))
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Prometheus metrics: request, LLM and Mongo latencies, analysis fallbacks and queue depths"""
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/api/health")
 async def health_check():
+    """Liveness: the process is up and serving requests"""
+    
     return {"status": "healthy", "service": "Trust Lens API"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: this worker has started, is not shutting down and can reach Mongo"""
+    
+    if not accepting_traffic:
+        return FastJSONResponse({"status": "unavailable", "mongo": "not checked"}, status_code=503)
+    
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("Readiness check could not reach Mongo: %s", e)
+        return FastJSONResponse({"status": "unavailable", "mongo": "unreachable"}, status_code=503)
+    
+    return {
+        "status": "ready",
+        "mongo": "ok",
+        "mongo_ping_ms": round((time.perf_counter() - start) * 1000, 1),
+        "pid": os.getpid(),
+    }
+
+@app.get("/api/llm/stats")
+async def get_llm_stats():
+    """Get call, retry and rate limiter counters for the shared LLM client"""
+
+    if llm_client is None:
+        return {"llm_client": None}
+    return {"llm_client": llm_client.stats()}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss/eviction counters and memory use of the analysis and product caches"""
+
+    return {
+        "analysis_cache": analysis_cache.stats(),
+        "product_cache": product_cache.stats(),
+        "analysis_singleflight": analysis_flight.stats()
+    }
+
+AnalysisMode = Literal["fast", "llm", "hybrid"]
+
+def refinement_job_id(product_id: str) -> str:
+    return f"refine:{product_id}"
+
 @app.post("/api/analyze-product")
-async def analyze_product(request: ProductRequest):
-    """Analyze a product and generate trust score"""
+async def analyze_product(
+    request: ProductRequest,
+    run_async: bool = Query(False, alias="async"),
+    mode: AnalysisMode = "llm"
+):
+    """Analyze a product and generate trust score
+    
+    mode=fast scores the reviews locally without calling the LLM, and
+    mode=hybrid returns the local score right away while a background job
+    (reported in the X-Refinement-Job header) replaces it with the LLM
+    analysis; a cached LLM analysis is returned directly and no job is
+    queued, nor is one when the queue is full. With async=true the analysis runs as a background job and
+    the response is a 202 pointing at GET /api/jobs/{job_id}.
+    """
+    
+    if run_async:
+        try:
+            job = await analysis_jobs.submit("analyze_product", {**request.dict(), "mode": mode})
+        except QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Analysis queue is full, retry later",
+                headers={"Retry-After": "5"}
+            )
+        return FastJSONResponse(
+            status_code=202,
+            content={
+                "job_id": job["id"],
+                "status": job["status"],
+                "status_url": f"/api/jobs/{job['id']}"
+            }
+        )
+    
+    product, refinement_job = await analyze_once(request, mode)
+    headers = {"X-Refinement-Job": refinement_job} if refinement_job else None
+    return FastJSONResponse(product, headers=headers)
+
+async def analyze_once(request: ProductRequest, mode: str) -> Tuple[Product, Optional[str]]:
+    """Run an analysis, sharing it with any identical analysis already in flight"""
+    
+    return await analysis_flight.do(
+        f"{mode}:{canonical_request_key(request)}",
+        lambda: run_product_analysis(request, mode)
+    )
+
+def create_product(request: ProductRequest) -> tuple:
+    """Create a product record and its reviews for an analysis request"""
     
     # Generate product ID
     product_id = str(uuid.uuid4())
@@ -295,102 +1071,552 @@ async def analyze_product(request: ProductRequest):
         )
         product_reviews.append(review)
     
-    # Generate AI-powered trust analysis
-    trust_score = await generate_trust_analysis(product_id, MOCK_REVIEWS)
+    return product, product_reviews
+
+async def run_product_analysis(request: ProductRequest, mode: str = "llm") -> Tuple[Product, Optional[str]]:
+    """Create, analyze and persist a product
+    
+    Returns the product and, in hybrid mode, the id of the refinement job
+    if one was queued.
+    """
+    
+    product, product_reviews = create_product(request)
+    
+    refine = False
+    if mode == "llm":
+        # Generate AI-powered trust analysis
+        trust_score = await generate_trust_analysis(product.id, MOCK_REVIEWS)
+    elif mode == "hybrid":
+        # A cached LLM analysis is as quick as local scoring and needs no refinement
+        trust_score = await cached_trust_analysis(product.id, MOCK_REVIEWS)
+        if trust_score is None:
+            trust_score = fallback_trust_score(product.id, MOCK_REVIEWS)
+            refine = True
+    else:
+        # Local scoring answers in milliseconds
+        trust_score = fallback_trust_score(product.id, MOCK_REVIEWS)
     
     # Update product with trust score
     product.trust_score = trust_score
     
-    # Save to database
-    await products_collection.insert_one(product.dict())
+    # Save product, reviews and trust score concurrently in bulk
+    await analysis_writer.save(
+        product.dict(),
+        [review.dict() for review in product_reviews],
+        trust_score.dict()
+    )
     
-    # Save reviews to database
-    for review in product_reviews:
-        await reviews_collection.insert_one(review.dict())
+    refinement_job = None
+    if refine:
+        try:
+            job = await analysis_jobs.submit(
+                "refine_trust_score",
+                {"product_id": product.id},
+                job_id=refinement_job_id(product.id)
+            )
+            refinement_job = job["id"]
+        except QueueFull:
+            logger.warning("Analysis queue full, keeping local trust score for %s", product.id)
     
-    # Save trust score to database
-    await trust_scores_collection.insert_one(trust_score.dict())
+    return product, refinement_job
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
     
-    return product
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_product_analysis(request: ProductRequest, emit: Callable[[str, Any], Awaitable[None]]) -> None:
+    """Create, analyze and persist a product, reporting each step as it completes"""
+    
+    product, product_reviews = create_product(request)
+    await emit("product", product.dict())
+    
+    # The local score is ready in milliseconds and gives clients something to show
+    preliminary_score = fallback_trust_score(product.id, MOCK_REVIEWS)
+    await emit("preliminary_score", preliminary_score.dict())
+    
+    await analysis_writer.save(product.dict(), [review.dict() for review in product_reviews])
+    await emit("reviews", {"product_id": product.id, "total": len(product_reviews)})
+    
+    streamed = set()
+    
+    async def emit_aspect(aspect: Dict[str, Any]) -> None:
+        try:
+            aspect = AspectAnalysis(**aspect).dict()
+        except Exception:
+            return
+        streamed.add(aspect["aspect"])
+        await emit("aspect", aspect)
+    
+    try:
+        trust_score = await generate_trust_analysis(product.id, MOCK_REVIEWS, on_aspect=emit_aspect)
+    except Exception:
+        # The product is already stored; keep the local score rather than
+        # leaving it unscored, and let the client see the error
+        await analysis_writer.update_trust_score(product.id, preliminary_score.dict())
+        raise
+    
+    # Cached and fallback analyses never went through the stream parser
+    for aspect in trust_score.aspect_analysis:
+        if aspect.aspect not in streamed:
+            await emit("aspect", aspect.dict())
+    
+    await analysis_writer.update_trust_score(product.id, trust_score.dict())
+    await emit("trust_score", trust_score.dict())
+
+# Streamed analyses keep running if their client disconnects; hold references
+# so the tasks are not garbage collected mid-flight
+streaming_tasks = set()
+
+@app.post("/api/analyze-product/stream")
+async def analyze_product_stream(request: ProductRequest):
+    """Analyze a product, streaming progress as Server-Sent Events
+    
+    Events, in order: product, preliminary_score (local heuristic score),
+    reviews, one aspect per AspectAnalysis, trust_score, then done (or
+    error).
+    """
+    
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def emit(event: str, data: Any) -> None:
+        await events.put(sse_event(event, data))
+    
+    async def produce() -> None:
+        try:
+            await stream_product_analysis(request, emit)
+            await emit("done", {})
+        except Exception as error:
+            logger.exception("Streamed analysis failed")
+            await emit("error", {"detail": getattr(error, "detail", None) or str(error)})
+        finally:
+            await events.put(None)
+    
+    task = asyncio.create_task(produce())
+    streaming_tasks.add(task)
+    task.add_done_callback(streaming_tasks.discard)
+    
+    async def event_stream():
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/analyze-products")
+async def analyze_products(requests: List[ProductRequest]):
+    """Analyze a catalog of products in bulk
+    
+    Products with identical review sets are analyzed once, and the
+    remaining review sets are packed several to a prompt.
+    """
+    
+    if len(requests) > BATCH_MAX_PRODUCTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_MAX_PRODUCTS} products can be analyzed per request"
+        )
+    
+    created = [create_product(request) for request in requests]
+    
+    review_sets = {}
+    product_keys = []
+    for product, product_reviews in created:
+        reviews = [review.dict() for review in product_reviews]
+        cache_key = analysis_cache_key(reviews, LLM_MODEL, PROMPT_VERSION)
+        review_sets.setdefault(cache_key, reviews)
+        product_keys.append(cache_key)
+    
+    analyses, failures = await generate_batch_trust_analyses(review_sets)
+    
+    records = []
+    for (product, product_reviews), cache_key in zip(created, product_keys):
+        if cache_key in analyses:
+            trust_score = build_trust_score(product.id, analyses[cache_key])
+        else:
+            # The prompt of this review set failed, or the model garbled or skipped it
+            ANALYSES.labels("fallback").inc()
+            ANALYSIS_FALLBACKS.labels(failures.get(cache_key, "batch_missing")).inc()
+            trust_score = fallback_trust_score(product.id, review_sets[cache_key])
+        product.trust_score = trust_score
+        records.append((
+            product.dict(),
+            [review.dict() for review in product_reviews],
+            trust_score.dict()
+        ))
+    
+    # One bulk write per collection for the whole catalog
+    await analysis_writer.save_many(records)
+    
+    return FastJSONResponse({
+        "products": [product for product, _ in created],
+        "total": len(created)
+    })
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """Get the status of an analysis job, optionally long-polling until it finishes"""
+    
+    if wait:
+        job = await analysis_jobs.wait(job_id, wait)
+    else:
+        job = await analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+# Fields that change whenever a product document does
+PRODUCT_VERSION_PROJECTION = {"_id": 0, "id": 1, "created_at": 1, "trust_score.updated_at": 1}
+
+def product_etag(product: Dict[str, Any]) -> str:
+    """ETag for a product document; products only change when they are re-scored"""
+    
+    updated_at = (product.get("trust_score") or {}).get("updated_at") or ""
+    return make_etag(product["id"], product.get("created_at") or "", updated_at)
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL}
 
 @app.get("/api/product/{product_id}")
-async def get_product(product_id: str):
-    """Get product details with trust analysis"""
+async def get_product(product_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get product details with trust analysis
     
-    product = await products_collection.find_one({"id": product_id}, {"_id": 0})
+    Hot products are served from the in-process product cache. Responses
+    carry an ETag; a matching If-None-Match is answered with 304, after
+    reading only the version fields of the product when it is not cached.
+    """
+    
+    product = await product_cache.cached(product_id)
+    if product is None and if_none_match:
+        version = await products_collection.find_one({"id": product_id}, PRODUCT_VERSION_PROJECTION)
+        if not version:
+            raise HTTPException(status_code=404, detail="Product not found")
+        etag = product_etag(version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(cache_headers(etag))
+    if product is None:
+        product = await product_cache.load(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    return product
+    etag = product_etag(product)
+    if etag_matches(if_none_match, etag):
+        return not_modified(cache_headers(etag))
+    
+    return FastJSONResponse(product, headers=cache_headers(etag))
 
-@app.get("/api/products")
-async def get_products(limit: int = 10, offset: int = 0):
-    """Get all analyzed products"""
+def encode_page_cursor(product: Dict[str, Any]) -> str:
+    """Encode the keyset position after a product as an opaque token"""
     
-    cursor = products_collection.find({}, {"_id": 0}).skip(offset).limit(limit)
-    products = await cursor.to_list(length=limit)
+    position = json.dumps([product["created_at"], product["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_page_cursor(token: str) -> Dict[str, Any]:
+    """Turn an opaque page token back into a keyset filter"""
+    
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(product_id, str):
+            raise ValueError("malformed cursor")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
     return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": product_id}}
+        ]
+    }
+
+@app.get("/api/products")
+async def get_products(
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    exact_total: bool = False,
+    fields: Literal["summary", "full"] = "summary"
+):
+    """Get analyzed products, newest first, one keyset page at a time
+    
+    Products are listed as summaries (id, name, overall_score,
+    recommendation, created_at); pass fields=full for complete product
+    documents. Pass the returned next_cursor to fetch the following page.
+    offset is only honoured without a cursor and is kept for older clients.
+    """
+    
+    query = decode_page_cursor(cursor) if cursor else {}
+    projection = {"_id": 0} if fields == "full" else PRODUCT_SUMMARY_PROJECTION
+    
+    # Fetch one extra document to learn whether another page exists
+    page = products_collection.find(query, projection).sort(PRODUCT_PAGE_SORT)
+    if offset and not cursor:
+        page = page.skip(offset)
+    products = await page.limit(limit + 1).to_list(length=limit + 1)
+    
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_page_cursor(products[-1])
+    
+    if fields == "summary":
+        products = [summarize_product(product) for product in products]
+    
+    # Exact counts scan the index; metadata counts are O(1)
+    if exact_total:
+        total = await products_collection.count_documents({})
+    else:
+        total = await products_collection.estimated_document_count()
+    
+    return FastJSONResponse({
         "products": products,
-        "total": await products_collection.count_documents({}),
+        "total": total,
+        "total_is_exact": exact_total,
+        "next_cursor": next_cursor,
         "offset": offset,
         "limit": limit
+    })
+
+ReanalysisMode = Literal["incremental", "full", "none"]
+
+# Attempts at merging into a trust score that concurrent appends keep changing
+REVIEW_APPEND_MAX_ATTEMPTS = 5
+
+async def analyze_reviews(product_id: str, reviews: List[Dict], mode: str) -> Dict[str, Any]:
+    """Analysis data for a review set, scored locally (fast) or by the LLM"""
+    
+    if mode == "fast":
+        trust_score = fallback_trust_score(product_id, reviews)
+    else:
+        trust_score = await generate_trust_analysis(product_id, reviews)
+    return trust_score.dict(exclude={"product_id", "updated_at"})
+
+async def rescore_product(
+    product_id: str,
+    new_reviews: List[Dict],
+    reanalyze: str,
+    mode: str
+) -> Optional[TrustScore]:
+    """Fold newly linked reviews into a product's trust score
+    
+    Incremental rescoring analyzes only the new reviews and merges the
+    result into the stored analysis, weighted by review counts, so its cost
+    follows the number of new reviews rather than the product's history.
+    """
+    
+    if reanalyze == "full":
+        reviews = await load_product_reviews(product_id)
+        trust_score = build_trust_score(product_id, await analyze_reviews(product_id, reviews, mode))
+        await analysis_writer.update_trust_score(product_id, trust_score.dict())
+        return trust_score
+    
+    delta = await analyze_reviews(product_id, new_reviews, mode)
+    for _ in range(REVIEW_APPEND_MAX_ATTEMPTS):
+        product = await products_collection.find_one({"id": product_id}, {"_id": 0, "trust_score": 1})
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        stored = product.get("trust_score")
+        if stored and stored.get("total_reviews"):
+            merged = merge_analyses([(stored["total_reviews"], stored), (len(new_reviews), delta)])
+        else:
+            merged = delta
+        trust_score = build_trust_score(product_id, merged)
+        
+        # Only replace the score this merge was based on; retry if another append won
+        expected = stored["updated_at"] if stored else None
+        if await analysis_writer.update_trust_score(product_id, trust_score.dict(), expected_updated_at=expected):
+            return trust_score
+    
+    raise HTTPException(status_code=409, detail="Trust score changed concurrently, retry later")
+
+@app.post("/api/product/{product_id}/reviews")
+async def append_product_reviews(
+    product_id: str,
+    reviews: List[ReviewInput],
+    reanalyze: ReanalysisMode = "incremental",
+    mode: Literal["fast", "llm"] = "llm"
+):
+    """Add reviews to an analyzed product and refresh its trust score
+    
+    Reviews the product already has are ignored. reanalyze=incremental
+    (the default) analyzes only the added reviews and merges them into the
+    stored trust score, reanalyze=full analyzes every review again and
+    reanalyze=none leaves the trust score as it is.
+    
+    Added reviews stay pending until a rescore succeeds, so reviews linked
+    by a request whose rescore failed are scored when it is retried.
+    """
+    
+    if await products_collection.count_documents({"id": product_id}, limit=1) == 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    added = await analysis_writer.link_reviews(
+        [(product_id, review.dict()) for review in reviews],
+        pending=reanalyze != "none"
+    )
+    
+    trust_score = None
+    rescored = 0
+    if reanalyze != "none":
+        claim, review_ids = await analysis_writer.claim_pending_reviews(product_id)
+        if review_ids:
+            scored = False
+            try:
+                pending_reviews = [] if reanalyze == "full" else await load_product_reviews(
+                    product_id, review_ids=review_ids
+                )
+                trust_score = await rescore_product(product_id, pending_reviews, reanalyze, mode)
+                scored = True
+            finally:
+                await analysis_writer.release_pending_reviews(product_id, claim, scored)
+            rescored = len(review_ids)
+    
+    return FastJSONResponse({
+        "product_id": product_id,
+        "added": len(added),
+        "duplicates": len(reviews) - len(added),
+        "rescored": rescored,
+        "trust_score": trust_score
+    })
+
+async def store_review_rows(rows: List[ReviewRow]) -> Tuple[int, Dict[int, str]]:
+    """Store one batch of a bulk review load
+    
+    Returns the number of new product/review links and the errors of rows
+    naming a product that does not exist, by position in the batch.
+    """
+    
+    product_ids = list({row.product_id for row in rows})
+    cursor = products_collection.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1})
+    known = {product["id"] for product in await cursor.to_list(length=len(product_ids))}
+    
+    refused = {
+        index: f"Product {row.product_id} not found"
+        for index, row in enumerate(rows) if row.product_id not in known
     }
+    links = [(row.product_id, row.dict()) for row in rows if row.product_id in known]
+    added = await analysis_writer.link_reviews(links) if links else []
+    return len(added), refused
+
+@app.post("/api/reviews/bulk")
+async def bulk_import_reviews(request: Request):
+    """Load reviews from a streamed NDJSON body, one review per line
+    
+    Lines are validated as they arrive and written in unordered batches;
+    the body is never held in memory as a whole. Invalid lines and reviews
+    of unknown products are reported by line number and do not stop the
+    load. Trust scores are not updated;
+    use POST /api/product/{product_id}/reviews to rescore a product.
+    """
+    
+    ingest = NdjsonIngest(
+        ReviewRow.model_validate_json,
+        store_review_rows,
+        batch_size=BULK_REVIEW_BATCH_SIZE,
+        max_in_flight=BULK_REVIEW_MAX_IN_FLIGHT
+    )
+    return FastJSONResponse(await ingest.run(request.stream()))
 
 @app.get("/api/reviews/{product_id}")
-async def get_product_reviews(product_id: str):
-    """Get reviews for a specific product"""
+async def get_product_reviews(product_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get reviews for a specific product
+    
+    Stored reviews never change, so the ids of the listed reviews identify
+    the response. They come from the product_reviews index, which lets a
+    matching If-None-Match be answered with 304 without reading any review.
+    """
     
-    cursor = reviews_collection.find({"product_id": product_id}, {"_id": 0})
-    reviews = await cursor.to_list(length=100)
+    review_ids = await load_product_review_ids(product_id, limit=100)
+    if review_ids:
+        etag = make_etag(product_id, *review_ids)
+        if etag_matches(if_none_match, etag):
+            return not_modified(cache_headers(etag))
     
-    return {
+    reviews = await load_product_reviews(product_id, limit=100, review_ids=review_ids)
+    if not review_ids:
+        # Reviews stored before de-duplication are versioned by their own ids
+        etag = make_etag(product_id, *(review.get("id", "") for review in reviews))
+        if etag_matches(if_none_match, etag):
+            return not_modified(cache_headers(etag))
+    
+    return FastJSONResponse({
         "product_id": product_id,
         "reviews": reviews,
         "total": len(reviews)
-    }
+    }, headers=cache_headers(etag))
 
 @app.get("/api/dashboard/analytics")
 async def get_dashboard_analytics():
     """Get B2B dashboard analytics"""
     
-    total_products = await products_collection.count_documents({})
-    total_reviews = await reviews_collection.count_documents({})
+    analytics, today = await asyncio.gather(dashboard_stats.read(), activity_rollups.day())
+    analytics["recent_activity"] = {
+        "products_analyzed_today": today["products_analyzed"],
+        "reviews_processed": today["reviews_processed"],
+        "trust_scores_updated": today["scores_updated"],
+        "average_score_today": today["average_score"]
+    }
     
-    # Get average trust scores
-    pipeline = [
-        {
-            "$group": {
-                "_id": None,
-                "avg_trust_score": {"$avg": "$trust_score.overall_score"},
-                "total_products": {"$sum": 1}
-            }
-        }
-    ]
+    return analytics
+
+@app.get("/api/dashboard/timeseries")
+async def get_dashboard_timeseries(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: Literal["minute", "hour", "day"] = HOUR
+):
+    """Activity per minute, hour or day between from and to (UTC; the last 24 hours by default)
     
-    result = await products_collection.aggregate(pipeline).to_list(length=1)
-    avg_trust_score = result[0]["avg_trust_score"] if result else 0
+    Only the buckets of the requested resolution within the range are read.
+    Buckets past their retention have expired and read as empty.
+    """
     
-    # Platform distribution
-    platform_pipeline = [
-        {"$unwind": "$reviews"},
-        {"$group": {"_id": "$platform", "count": {"$sum": 1}}}
-    ]
+    # Times without an offset are taken as UTC
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if (end - start) / STEPS[step] > TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range covers more than {TIMESERIES_MAX_POINTS} {step}s; use a coarser step"
+        )
     
-    platform_stats = await reviews_collection.aggregate(platform_pipeline).to_list(length=10)
+    points = await activity_rollups.series(start, end, step)
+    return {"step": step, "from": points[0]["start"] if points else None, "to": end.isoformat(), "points": points}
+
+@app.post("/api/dashboard/analytics/rebuild")
+async def rebuild_dashboard_analytics():
+    """Recompute the materialized dashboard stats from the source collections"""
     
-    return {
-        "total_products": total_products,
-        "total_reviews": total_reviews,
-        "average_trust_score": round(avg_trust_score, 2),
-        "platform_distribution": platform_stats,
-        "recent_activity": {
-            "products_analyzed_today": 12,
-            "reviews_processed": 156,
-            "trust_scores_updated": 8
-        }
-    }
+    await dashboard_stats.rebuild()
+    return await dashboard_stats.read()
 
 if __name__ == "__main__":
+    import tempfile
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", "8001"))
+    if WEB_CONCURRENCY == 1:
+        uvicorn.run(app, host=host, port=port)
+    else:
+        # Each worker imports the app itself; workers must agree on where
+        # metrics are collected before they import prometheus_client
+        if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="trustlens-metrics-")
+        uvicorn.run(
+            "server:app",
+            host=host,
+            port=port,
+            workers=WEB_CONCURRENCY,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+        )
\ No newline at end of file
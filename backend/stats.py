@@ -0,0 +1,163 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from activity import ActivityRollups
+
+DASHBOARD_STATS_ID = "global"
+
+
+def platform_key(platform: str) -> str:
+    """Make a platform name safe to use as a field name"""
+
+    return (platform or "unknown").replace(".", "_").replace("$", "_")
+
+
+class DashboardStats:
+    """Materialized dashboard counters kept up to date on every write
+
+    The stats live in a single document so the dashboard is one point read.
+    Averages are stored as a running sum and count so that they can be
+    updated with $inc instead of being recomputed. When activity rollups
+    are given, every write is also counted in its time buckets.
+    """
+
+    def __init__(self, db, activity: Optional[ActivityRollups] = None):
+        self.collection = db["dashboard_stats"]
+        self.activity = activity
+        self.products = db["products"]
+        self.reviews = db["reviews"]
+        self.product_reviews = db["product_reviews"]
+
+    def increments(self, analyses: List[Tuple]) -> Dict[str, Any]:
+        inc = {"total_products": 0, "total_reviews": 0}
+        for _, reviews, trust_score in analyses:
+            inc["total_products"] += 1
+            inc["total_reviews"] += len(reviews)
+            if trust_score is not None:
+                inc["trust_score_sum"] = inc.get("trust_score_sum", 0) + trust_score["overall_score"]
+                inc["trust_score_count"] = inc.get("trust_score_count", 0) + 1
+            self._count_platforms(inc, reviews)
+        return inc
+
+    def _count_platforms(self, inc: Dict[str, Any], reviews: List[Dict[str, Any]]) -> None:
+        for review in reviews:
+            key = f"platforms.{platform_key(review.get('platform'))}"
+            inc[key] = inc.get(key, 0) + 1
+
+    async def _update(self, inc: Dict[str, Any], session=None) -> None:
+        await self.collection.update_one(
+            {"_id": DASHBOARD_STATS_ID},
+            {
+                "$inc": inc,
+                "$set": {"updated_at": datetime.now().isoformat()},
+            },
+            upsert=True,
+            session=session,
+        )
+
+    @staticmethod
+    async def _run(writes: List, session=None) -> None:
+        # A session must not be used by concurrent operations, so writes
+        # inside a transaction are issued one after the other
+        if session is None:
+            await asyncio.gather(*writes)
+            return
+        for write in writes:
+            await write
+
+    async def record(self, analyses: List[Tuple], session=None) -> None:
+        """Fold a batch of (product, reviews, trust score) writes into the stats"""
+
+        writes = [self._update(self.increments(analyses), session=session)]
+        if self.activity is not None:
+            writes.append(self.activity.record(
+                products_analyzed=len(analyses),
+                reviews_processed=sum(len(reviews) for _, reviews, _ in analyses),
+                scores=[trust_score["overall_score"] for _, _, trust_score in analyses if trust_score is not None],
+                session=session,
+            ))
+        await self._run(writes, session)
+
+    async def record_reviews(self, reviews: List[Dict[str, Any]], session=None) -> None:
+        """Count reviews added to products that are already stored"""
+
+        inc = {"total_reviews": len(reviews)}
+        self._count_platforms(inc, reviews)
+        writes = [self._update(inc, session=session)]
+        if self.activity is not None:
+            writes.append(self.activity.record(reviews_processed=len(reviews), session=session))
+        await self._run(writes, session)
+
+    async def record_rescore(self, previous_score: Optional[float], new_score: float) -> None:
+        """Swap a product's old trust score for its new one in the running average"""
+
+        inc = {"trust_score_sum": new_score - (previous_score or 0)}
+        if previous_score is None:
+            # First score for a product that was stored before it was analyzed
+            inc["trust_score_count"] = 1
+        writes = [self._update(inc)]
+        if self.activity is not None:
+            writes.append(self.activity.record(scores=[new_score]))
+        await asyncio.gather(*writes)
+
+    async def read(self) -> Dict[str, Any]:
+        document = await self.collection.find_one({"_id": DASHBOARD_STATS_ID}) or {}
+        score_count = document.get("trust_score_count", 0)
+        platforms = document.get("platforms", {})
+        return {
+            "total_products": document.get("total_products", 0),
+            "total_reviews": document.get("total_reviews", 0),
+            "average_trust_score": round(document.get("trust_score_sum", 0) / score_count, 2) if score_count else 0,
+            "platform_distribution": [
+                {"_id": platform, "count": count}
+                for platform, count in sorted(platforms.items(), key=lambda item: -item[1])
+            ],
+        }
+
+    async def exists(self) -> bool:
+        return await self.collection.count_documents({"_id": DASHBOARD_STATS_ID}, limit=1) > 0
+
+    async def rebuild(self) -> Dict[str, Any]:
+        """Recompute the stats document from the source collections
+
+        Writes that land while the rebuild is scanning are not reflected;
+        run it when traffic is quiet or simply run it again.
+        """
+
+        score_pipeline = [
+            {"$match": {"trust_score.overall_score": {"$type": "number"}}},
+            {"$group": {"_id": None, "sum": {"$sum": "$trust_score.overall_score"}, "count": {"$sum": 1}}},
+        ]
+        scores = await self.products.aggregate(score_pipeline).to_list(length=1)
+
+        # Review totals count product/review pairs: linked shared reviews plus
+        # per-product review copies stored before de-duplication
+        linked_pipeline = [
+            {"$lookup": {"from": "reviews", "localField": "review_id", "foreignField": "_id", "as": "review"}},
+            {"$unwind": "$review"},
+            {"$group": {"_id": "$review.platform", "count": {"$sum": 1}}},
+        ]
+        legacy_pipeline = [
+            {"$match": {"product_id": {"$exists": True}}},
+            {"$group": {"_id": "$platform", "count": {"$sum": 1}}},
+        ]
+        platforms: Dict[str, int] = {}
+        for rows in (
+            await self.product_reviews.aggregate(linked_pipeline).to_list(length=None),
+            await self.reviews.aggregate(legacy_pipeline).to_list(length=None),
+        ):
+            for row in rows:
+                key = platform_key(row["_id"])
+                platforms[key] = platforms.get(key, 0) + row["count"]
+
+        document = {
+            "total_products": await self.products.count_documents({}),
+            "total_reviews": sum(platforms.values()),
+            "trust_score_sum": scores[0]["sum"] if scores else 0,
+            "trust_score_count": scores[0]["count"] if scores else 0,
+            "platforms": platforms,
+            "updated_at": datetime.now().isoformat(),
+        }
+        await self.collection.replace_one({"_id": DASHBOARD_STATS_ID}, document, upsert=True)
+        return document
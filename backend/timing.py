@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger("trustlens.timing")
+
+# Spans of the request being handled; None outside requests (and in
+# background jobs), which turns span() into a no-op
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing_spans", default=None)
+
+_TOKEN = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as a Server-Timing entry of the current request"""
+
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - start) * 1000))
+
+
+async def timed(name: str, awaitable: Awaitable[T]) -> T:
+    """Await awaitable inside a span"""
+
+    with span(name):
+        return await awaitable
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total_ms: float) -> str:
+    entries = [f"{_TOKEN.sub('-', name)};dur={duration:.1f}" for name, duration in spans]
+    entries.append(f"app;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware reporting named spans in a Server-Timing header, with opt-in profiling
+
+    Spans recorded with span() while the request is handled are sent with
+    the response headers. Spans that end after the headers went out (in a
+    streamed body, say) are not reported.
+
+    A request is profiled when profiling is enabled and it carries an
+    X-Profile: true header, or when it is picked by sample_rate. The
+    pyinstrument profile is written to profile_dir as HTML and its file
+    name returned in an X-Profile header. Requests that are not profiled
+    pay for one random() call and one header lookup.
+    """
+
+    def __init__(
+        self,
+        app,
+        enabled: bool = True,
+        profiling_enabled: bool = False,
+        sample_rate: float = 0.0,
+        profile_dir: str = "profiles",
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.profiling_enabled = profiling_enabled
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+
+    def _wants_profile(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if not self.profiling_enabled:
+            return False
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile":
+                return value.lower() in (b"1", b"true")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.enabled or self.profiling_enabled or self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+
+        profiler = None
+        profile_name = None
+        if self._wants_profile(scope):
+            # Imported on demand so the profiler costs nothing while unused
+            from pyinstrument import Profiler
+
+            profiler = Profiler(async_mode="enabled")
+            route = _TOKEN.sub("-", scope["path"]).strip("-")
+            profile_name = f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}-{scope['method']}-{route}.html"
+            profiler.start()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if self.enabled:
+                    header = server_timing_header(spans, (time.perf_counter() - start) * 1000)
+                    headers.append((b"server-timing", header.encode("latin-1")))
+                if profile_name:
+                    headers.append((b"x-profile", profile_name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            if profiler is not None:
+                profiler.stop()
+                await asyncio.to_thread(self._save_profile, profiler, profile_name)
+
+    def _save_profile(self, profiler, name: str) -> None:
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, name)
+            with open(path, "w", encoding="utf-8") as profile:
+                profile.write(profiler.output_html())
+            logger.info("Saved request profile to %s", path)
+        except Exception:
+            logger.exception("Could not save request profile %s", name)
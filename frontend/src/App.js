@@ -43,6 +43,16 @@ function App() {
     }
   };
 
+  const fetchProductReviews = async (productId) => {
+    try {
+      const response = await fetch(`${backendUrl}/api/reviews/${productId}`);
+      const data = await response.json();
+      setProductReviews(data.reviews || []);
+    } catch (error) {
+      console.error('Error fetching product reviews:', error);
+    }
+  };
+
   const analyzeProduct = async () => {
     if (!productInput.trim() && !productName.trim()) {
       alert('Please enter a product URL or name');
@@ -50,8 +60,9 @@ function App() {
     }
 
     setLoading(true);
+    setAnalysisResult(null);
     try {
-      const response = await fetch(`${backendUrl}/api/analyze-product`, {
+      const response = await fetch(`${backendUrl}/api/analyze-product/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -63,12 +74,55 @@ function App() {
         }),
       });
 
-      const data = await response.json();
-      setAnalysisResult(data);
-      
+      // Read Server-Sent Events as they arrive and render each step immediately
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let productId = null;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventName = 'message';
+          let eventData = '';
+          rawEvent.split('\n').forEach((line) => {
+            if (line.startsWith('event:')) eventName = line.slice(6).trim();
+            if (line.startsWith('data:')) eventData += line.slice(5).trim();
+          });
+          const data = eventData ? JSON.parse(eventData) : {};
+
+          if (eventName === 'product') {
+            productId = data.id;
+            setAnalysisResult({ ...data, trust_score: null });
+          } else if (eventName === 'preliminary_score') {
+            setAnalysisResult((current) => ({ ...current, trust_score: { ...data, preliminary: true } }));
+          } else if (eventName === 'aspect') {
+            setAnalysisResult((current) => ({
+              ...current,
+              trust_score: {
+                ...current.trust_score,
+                aspect_analysis: current.trust_score.aspect_analysis.some((aspect) => aspect.aspect === data.aspect)
+                  ? current.trust_score.aspect_analysis.map((aspect) => (aspect.aspect === data.aspect ? data : aspect))
+                  : [...current.trust_score.aspect_analysis, data]
+              }
+            }));
+          } else if (eventName === 'trust_score') {
+            setAnalysisResult((current) => ({ ...current, trust_score: data }));
+          } else if (eventName === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
+
       // Fetch reviews for this product
-      if (data.id) {
-        fetchProductReviews(data.id);
+      if (productId) {
+        fetchProductReviews(productId);
       }
     } catch (error) {
       console.error('Error analyzing product:', error);
@@ -181,12 +235,17 @@ function App() {
             <p className="text-gray-600 mt-1">{analysisResult.description}</p>
           </div>
 
+          {analysisResult.trust_score && (
+          <div>
           {/* Overall Trust Score */}
           <div className={`rounded-lg p-4 border-2 mb-6 ${getTrustScoreBg(analysisResult.trust_score.overall_score)}`}>
             <div className="flex items-center justify-between">
               <div>
                 <h4 className="text-lg font-semibold text-gray-900">Overall Trust Score</h4>
-                <p className="text-sm text-gray-600">Based on {analysisResult.trust_score.total_reviews} reviews</p>
+                <p className="text-sm text-gray-600">
+                  Based on {analysisResult.trust_score.total_reviews} reviews
+                  {analysisResult.trust_score.preliminary && ' (preliminary, refining with AI...)'}
+                </p>
               </div>
               <div className="text-right">
                 <div className={`text-4xl font-bold ${getTrustScoreColor(analysisResult.trust_score.overall_score)}`}>
@@ -234,6 +293,8 @@ function App() {
               <p className="text-green-800">{analysisResult.trust_score.recommendation}</p>
             </div>
           </div>
+          </div>
+          )}
 
           {/* Platforms Analyzed */}
           <div className="mt-6 p-4 bg-gray-50 rounded-lg">
@@ -295,15 +356,15 @@ function App() {
                 <div key={index} className="flex items-center justify-between p-4 bg-gray-50 rounded-lg">
                   <div className="flex-1">
                     <h3 className="font-medium text-gray-900">{product.name}</h3>
-                    <p className="text-sm text-gray-600">{product.description}</p>
+                    <p className="text-sm text-gray-600">{product.recommendation}</p>
                     <p className="text-xs text-gray-500 mt-1">
                       Analyzed: {new Date(product.created_at).toLocaleDateString()}
                     </p>
                   </div>
-                  {product.trust_score && (
+                  {product.overall_score != null && (
                     <div className="text-right">
-                      <div className={`text-2xl font-bold ${getTrustScoreColor(product.trust_score.overall_score)}`}>
-                        {product.trust_score.overall_score}
+                      <div className={`text-2xl font-bold ${getTrustScoreColor(product.overall_score)}`}>
+                        {product.overall_score}
                       </div>
                       <div className="text-sm text-gray-600">Trust Score</div>
                     </div>
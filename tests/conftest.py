@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules are imported flat, as server.py imports them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
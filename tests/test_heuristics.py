@@ -0,0 +1,42 @@
+from heuristics import ASPECT_KEYWORDS, score_reviews
+
+
+def review(rating, content, title="", verified=True):
+    return {"rating": rating, "title": title, "content": content, "verified": verified}
+
+
+def aspect(analysis, name):
+    return next(item for item in analysis["aspect_analysis"] if item["aspect"] == name)
+
+
+def test_empty_review_set_is_neutral():
+    analysis = score_reviews([])
+
+    assert analysis["overall_score"] == 50.0
+    assert analysis["total_reviews"] == 0
+    assert [item["aspect"] for item in analysis["aspect_analysis"]] == list(ASPECT_KEYWORDS)
+
+
+def test_reviews_without_text_are_scored_on_rating():
+    analysis = score_reviews([review(4, ""), review(4, "", title="")])
+
+    assert analysis["overall_score"] == 75.0
+    assert analysis["total_reviews"] == 2
+    assert all(item["score"] == 75.0 for item in analysis["aspect_analysis"])
+
+
+def test_negation_flips_positive_words():
+    praised = score_reviews([review(3, "The build quality is good.")])
+    negated = score_reviews([review(3, "The build quality is not good.")])
+
+    assert aspect(praised, "Quality")["score"] > 50
+    assert aspect(negated, "Quality")["score"] < 50
+
+
+def test_unverified_reviews_weigh_half():
+    verified_only = score_reviews([review(5, ""), review(1, "")])
+    unverified_negative = score_reviews([review(5, ""), review(1, "", verified=False)])
+
+    assert verified_only["overall_score"] == 50.0
+    # 5 stars at weight 1 against 1 star at weight 0.5
+    assert unverified_negative["overall_score"] == round(50 + 50 * (1 - 0.5) / 1.5, 1)
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from ingest import NdjsonIngest
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def store(batches):
+    async def flush(batch):
+        batches.append(batch)
+        return len(batch), {}
+    return flush
+
+
+def run(ingest, *chunks):
+    return asyncio.run(ingest.run(chunks_of(*chunks)))
+
+
+def test_lines_split_across_chunks_and_trailing_line_without_newline():
+    batches = []
+    ingest = NdjsonIngest(json.loads, store(batches), batch_size=2)
+
+    result = run(ingest, b'{"a": 1}\n{"a"', b': 2}\n\n{"a": 3}')
+
+    assert [row for batch in batches for row in batch] == [{"a": 1}, {"a": 2}, {"a": 3}]
+    assert result["lines"] == 4
+    assert result["accepted"] == result["added"] == 3
+    assert result["rejected"] == 0
+
+
+def test_invalid_and_over_long_lines_are_reported_by_line_number():
+    batches = []
+    ingest = NdjsonIngest(json.loads, store(batches), max_line_bytes=16)
+
+    long_line = b'{"a": "' + b"x" * 40 + b'"}\n'
+    result = run(ingest, b'{"a": 1}\nnot json\n', long_line[:20], long_line[20:], b'{"a": 4}\n')
+
+    assert [row for batch in batches for row in batch] == [{"a": 1}, {"a": 4}]
+    assert result["lines"] == 4
+    assert result["accepted"] == 2
+    assert result["rejected"] == 2
+    assert [error["line"] for error in result["errors"]] == [2, 3]
+    assert "longer than 16 bytes" in result["errors"][1]["error"]
+
+
+def test_refused_rows_are_reported_on_their_line():
+    async def flush(batch):
+        refused = {index: "unknown" for index, row in enumerate(batch) if row["a"] < 0}
+        return len(batch) - len(refused), refused
+
+    result = run(NdjsonIngest(json.loads, flush, batch_size=2), b'{"a": 1}\n{"a": -1}\n{"a": -2}\n')
+
+    assert result["accepted"] == result["added"] == 1
+    assert result["rejected"] == 2
+    assert result["errors"] == [{"line": 2, "error": "unknown"}, {"line": 3, "error": "unknown"}]
+
+
+def test_body_is_not_read_while_flushes_are_busy():
+    async def scenario():
+        gate = asyncio.Event()
+        read = []
+        busy = []
+        peak = []
+
+        async def flush(batch):
+            busy.append(batch)
+            peak.append(len(busy))
+            await gate.wait()
+            busy.remove(batch)
+            return len(batch), {}
+
+        async def body():
+            for index in range(6):
+                read.append(index)
+                yield f'{{"a": {index}}}\n'.encode()
+
+        ingest = NdjsonIngest(json.loads, flush, batch_size=1, max_in_flight=2)
+        task = asyncio.ensure_future(ingest.run(body()))
+        await asyncio.sleep(0.05)
+        # Two batches in flight and nothing read beyond them
+        assert len(read) == 2
+        gate.set()
+        result = await task
+        assert max(peak) == 2
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["added"] == 6
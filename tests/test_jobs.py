@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from jobs import FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_stop_requeues_the_jobs_it_was_running():
+    async def scenario():
+        collection = AsyncMongoMockClient()["trustlens_test"]["jobs"]
+        started = asyncio.Event()
+
+        async def hang(payload):
+            started.set()
+            await asyncio.Event().wait()
+
+        queue = JobQueue(collection, {"hang": hang}, workers=1, recovery_interval=3600)
+        await queue.start()
+        job = await queue.submit("hang", {})
+        await asyncio.wait_for(started.wait(), timeout=5)
+        await queue.stop()
+        return await queue.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == QUEUED
+    assert job["attempts"] == 0
+
+
+def test_recover_fails_expired_jobs_without_attempts_left():
+    async def scenario():
+        collection = AsyncMongoMockClient()["trustlens_test"]["jobs"]
+        expired = datetime.now(timezone.utc) - timedelta(minutes=1)
+        await collection.insert_many([
+            {"id": "spent", "status": RUNNING, "attempts": 3, "lease_expires_at": expired, "created_at": "1"},
+            {"id": "retry", "status": RUNNING, "attempts": 1, "lease_expires_at": expired, "created_at": "2"},
+        ])
+        queue = JobQueue(collection, {}, max_attempts=3)
+        queue._queue = asyncio.Queue()
+        await queue.recover()
+        return await queue.get("spent"), await queue.get("retry"), queue.depth()
+
+    spent, retry, depth = asyncio.run(scenario())
+    assert spent["status"] == FAILED
+    assert "lease expired" in spent["error"]
+    assert retry["status"] == QUEUED
+    assert depth == 1
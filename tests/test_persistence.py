@@ -0,0 +1,40 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from persistence import AnalysisWriter
+
+
+def review(index):
+    return {
+        "author": f"Reviewer {index}",
+        "rating": 4,
+        "title": f"Title {index}",
+        "content": f"Review number {index}",
+        "date": "2024-01-01",
+        "verified": True,
+        "platform": "example.com",
+    }
+
+
+def test_first_link_adopts_review_copies_of_older_products():
+    async def scenario():
+        db = AsyncMongoMockClient()["trustlens_test"]
+        # Products analyzed before de-duplication own per-product copies
+        await db["reviews"].insert_many([{**review(index), "id": f"copy-{index}", "product_id": "legacy"} for index in range(5)])
+        writer = AnalysisWriter(None, db)
+
+        added = await writer.link_reviews([("legacy", review(5)), ("legacy", review(0))], pending=True)
+
+        links = await db["product_reviews"].find({"product_id": "legacy"}).to_list(length=None)
+        copies = await db["reviews"].count_documents({"product_id": "legacy"})
+        return added, links, copies
+
+    added, links, copies = asyncio.run(scenario())
+
+    # The copy of review 0 was adopted first, so only review 5 is new
+    assert [item["content"] for _, item in added] == ["Review number 5"]
+    assert len(links) == 6
+    # Adopted copies are already reflected in the trust score
+    assert sum(1 for link in links if link.get("pending")) == 1
+    assert copies == 0